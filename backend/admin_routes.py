@@ -2,8 +2,13 @@ from fastapi import APIRouter, Request, HTTPException
 from fastapi.responses import HTMLResponse
 from fastapi.templating import Jinja2Templates
 from pydantic import BaseModel
-from typing import Dict, List
+from typing import Dict, List, Optional
 from backend.memory import session_memory
+from backend.database import SessionLocal
+from backend.models.chat_history import ChatHistory
+from backend.routes.history import query_chat_history, search_chat_history_fts
+from backend.tracing import span
+from backend.semantic_cache import semantic_caches, SEMANTIC_CACHE_CATEGORIES
 from datetime import datetime
 
 router = APIRouter()
@@ -18,7 +23,6 @@ ALL_FEATURES = {
 }
 feature_toggles: Dict[str, bool] = ALL_FEATURES.copy()
 feedback_store: List[Dict] = []
-chat_logs: List[Dict] = []
 
 prompt_categories = {
     "finance": "You are a financial advisor. Answer concisely.",
@@ -27,12 +31,23 @@ prompt_categories = {
 }
 
 @router.get("/admin", response_class=HTMLResponse)
-def admin_dashboard(request: Request):
-    return templates.TemplateResponse("dashboard.html", {
-        "request": request,
+def admin_dashboard(request: Request, q: Optional[str] = None):
+    db = SessionLocal()
+    try:
+        if q and q.strip():
+            chat_logs = search_chat_history_fts(db, q, limit=10)["items"]
+        else:
+            chat_logs = query_chat_history(db, limit=10)["items"]
+    except HTTPException:
+        chat_logs = []
+    finally:
+        db.close()
+
+    return templates.TemplateResponse(request, "dashboard.html", {
         "features": feature_toggles,
         "feedbacks": feedback_store,
-        "chat_logs": chat_logs[-10:],
+        "chat_logs": chat_logs,
+        "query": q or "",
     })
 
 @router.get("/admin/feature-toggles")
@@ -73,14 +88,27 @@ def get_prompt_template(category: str):
 
 @router.post("/admin/log-chat")
 def log_chat(session_id: str, prompt: str, response: str):
-    chat_logs.append({
-        "timestamp": datetime.now().isoformat(),
-        "session_id": session_id,
-        "prompt": prompt,
-        "response": response
-    })
+    db = SessionLocal()
+    try:
+        with span("db.chat_history.insert", session_id=session_id):
+            db.add(ChatHistory(
+                session_id=session_id,
+                prompt=prompt,
+                response=response,
+                timestamp=datetime.now()
+            ))
+            db.commit()
+    finally:
+        db.close()
     return {"message": "Chat logged"}
 
+@router.get("/admin/semantic-cache")
+def get_semantic_cache_stats():
+    return {
+        "enabled_categories": sorted(SEMANTIC_CACHE_CATEGORIES),
+        "caches": {category: cache.stats() for category, cache in semantic_caches.items()},
+    }
+
 @router.get("/memory/{session_id}")
 def get_memory(session_id: str):
     return session_memory.get(session_id, [])
@@ -0,0 +1,343 @@
+# Persistent calendar store: SQLite events behind an R*Tree interval index, plus iCalendar import
+#
+# Times are stored as naive UTC and treated as half-open [start, end). Every range query goes
+# through the R*Tree (O(log n + k)), so free/busy and conflict checks only ever touch the k events
+# that overlap the window, regardless of how many events other sessions or other months hold.
+import logging
+import re
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from sqlalchemy import DateTime, Integer, String, bindparam, select, text
+from sqlalchemy.dialects.sqlite import insert
+
+from backend.database import SessionLocal
+from backend.models.calendar_event import CalendarEvent, session_key
+
+logger = logging.getLogger(__name__)
+
+IMPORT_BATCH_SIZE = 500
+_MAX_SESSION_KEY = 0x7FFFFFFF
+
+# Candidates come from the R*Tree (minute-widened bounds), then are re-checked exactly.
+# CROSS JOIN pins the join order so SQLite always drives the query from the interval index.
+_OVERLAP_QUERY = text("""
+    SELECT e.* FROM calendar_events_rtree AS r CROSS JOIN calendar_events AS e ON e.id = r.id
+    WHERE r.session_min <= :key_max AND r.session_max >= :key_min
+      AND r.start_minute <= :end_minute AND r.end_minute >= :start_minute
+      AND (:session_id IS NULL OR e.session_id = :session_id)
+      AND e.start_time < :end AND e.end_time > :start
+    ORDER BY e.start_time, e.id
+    LIMIT :limit
+""").bindparams(
+    bindparam("start", type_=DateTime),
+    bindparam("end", type_=DateTime),
+    bindparam("session_id", type_=String),
+    bindparam("limit", type_=Integer),
+)
+
+
+def to_utc(value: datetime) -> datetime:
+    """Naive UTC; naive inputs are assumed to already be UTC"""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def parse_datetime(value: str) -> datetime:
+    """ISO 8601 from query strings and JSON bodies ("Z" suffix accepted)"""
+    if value.endswith("Z"):
+        value = value[:-1] + "+00:00"
+    return to_utc(datetime.fromisoformat(value))
+
+
+def serialize_event(event: CalendarEvent) -> Dict:
+    return {
+        "id": event.id,
+        "session_id": event.session_id,
+        "uid": event.uid,
+        "summary": event.summary,
+        "location": event.location,
+        "description": event.description,
+        "start": event.start_time.isoformat(),
+        "end": event.end_time.isoformat(),
+    }
+
+
+def query_events(
+    start: datetime,
+    end: datetime,
+    session_id: Optional[str] = None,
+    limit: int = -1,
+) -> List[CalendarEvent]:
+    """Events overlapping [start, end) ordered by start; all sessions when session_id is None"""
+    if session_id is None:
+        key_min, key_max = 0, _MAX_SESSION_KEY
+    else:
+        key_min = key_max = session_key(session_id)
+    start_minute = int(start.replace(tzinfo=timezone.utc).timestamp()) // 60
+    end_minute = -(-int(end.replace(tzinfo=timezone.utc).timestamp()) // 60)
+
+    db = SessionLocal()
+    try:
+        stmt = select(CalendarEvent).from_statement(_OVERLAP_QUERY)
+        return list(db.execute(stmt, {
+            "key_min": key_min,
+            "key_max": key_max,
+            "start_minute": start_minute,
+            "end_minute": end_minute,
+            "session_id": session_id,
+            "start": start,
+            "end": end,
+            "limit": limit,
+        }).scalars())
+    finally:
+        db.close()
+
+
+def add_event(
+    session_id: str,
+    summary: str,
+    start: datetime,
+    end: datetime,
+    location: Optional[str] = None,
+    description: Optional[str] = None,
+) -> CalendarEvent:
+    db = SessionLocal()
+    try:
+        event = CalendarEvent(
+            session_id=session_id,
+            session_key=session_key(session_id),
+            summary=summary,
+            location=location,
+            description=description,
+            start_time=start,
+            end_time=end,
+        )
+        db.add(event)
+        db.commit()
+        db.refresh(event)
+        return event
+    finally:
+        db.close()
+
+
+def delete_event(event_id: int, session_id: Optional[str] = None) -> bool:
+    db = SessionLocal()
+    try:
+        query = db.query(CalendarEvent).filter(CalendarEvent.id == event_id)
+        if session_id is not None:
+            query = query.filter(CalendarEvent.session_id == session_id)
+        deleted = query.delete(synchronize_session=False)
+        db.commit()
+        return bool(deleted)
+    finally:
+        db.close()
+
+
+def import_events(session_id: str, events: List[Dict]) -> int:
+    """Bulk upsert parsed events; events with a UID replace the session's earlier copy of that UID"""
+    if not events:
+        return 0
+
+    key = session_key(session_id)
+    rows = [{"session_id": session_id, "session_key": key, **event} for event in events]
+
+    db = SessionLocal()
+    try:
+        # Batched to stay under SQLite's bound-parameter limit on large calendars
+        for offset in range(0, len(rows), IMPORT_BATCH_SIZE):
+            stmt = insert(CalendarEvent).values(rows[offset:offset + IMPORT_BATCH_SIZE])
+            stmt = stmt.on_conflict_do_update(
+                index_elements=["session_id", "uid"],
+                set_={
+                    column: stmt.excluded[column]
+                    for column in ("summary", "location", "description", "start_time", "end_time")
+                },
+            )
+            db.execute(stmt)
+        db.commit()
+    finally:
+        db.close()
+    return len(rows)
+
+
+def busy_blocks(events: Iterable[CalendarEvent], start: datetime, end: datetime) -> List[Tuple[datetime, datetime]]:
+    """Merge start-ordered events into disjoint busy intervals clipped to [start, end)"""
+    blocks: List[List[datetime]] = []
+    for event in events:
+        block_start, block_end = max(event.start_time, start), min(event.end_time, end)
+        if block_end <= block_start:
+            continue
+        if blocks and block_start <= blocks[-1][1]:
+            blocks[-1][1] = max(blocks[-1][1], block_end)
+        else:
+            blocks.append([block_start, block_end])
+    return [(block_start, block_end) for block_start, block_end in blocks]
+
+
+def free_slots(
+    busy: List[Tuple[datetime, datetime]],
+    start: datetime,
+    end: datetime,
+    min_duration: timedelta = timedelta(0),
+) -> List[Tuple[datetime, datetime]]:
+    """Gaps between busy blocks within [start, end) lasting at least min_duration"""
+    slots = []
+    cursor = start
+    for block_start, block_end in busy:
+        if block_start - cursor >= min_duration and block_start > cursor:
+            slots.append((cursor, block_start))
+        cursor = max(cursor, block_end)
+    if end - cursor >= min_duration and end > cursor:
+        slots.append((cursor, end))
+    return slots
+
+
+def conflict_groups(events: Iterable[CalendarEvent]) -> List[List[CalendarEvent]]:
+    """Sweep start-ordered events into clusters linked by overlaps (clusters of one are dropped)"""
+    groups: List[List[CalendarEvent]] = []
+    current: List[CalendarEvent] = []
+    current_end: Optional[datetime] = None
+    for event in events:
+        if current and event.start_time < current_end:
+            current.append(event)
+            current_end = max(current_end, event.end_time)
+            continue
+        if len(current) > 1:
+            groups.append(current)
+        current, current_end = [event], event.end_time
+    if len(current) > 1:
+        groups.append(current)
+    return groups
+
+
+# --- iCalendar (RFC 5545) import ---
+
+_CONTENT_LINE = re.compile(r'^([A-Za-z0-9-]+)((?:;[A-Za-z0-9-]+=(?:"[^"]*"|[^";:]*)(?:,(?:"[^"]*"|[^";:]*))*)*):(.*)$')
+_PARAMETER = re.compile(r';([A-Za-z0-9-]+)=("[^"]*"|[^";:]*)')
+_DURATION = re.compile(r"^([+-])?P(?:(\d+)W)?(?:(\d+)D)?(?:T(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?)?$")
+
+
+def _unescape(value: str) -> str:
+    return re.sub(r"\\([\\;,nN])", lambda m: "\n" if m.group(1) in "nN" else m.group(1), value)
+
+
+def _parse_ics_datetime(value: str, parameters: Dict[str, str]) -> Tuple[datetime, bool]:
+    """
+    Returns (naive UTC datetime, is_all_day). Floating times and unknown TZIDs are taken as UTC.
+    TZIDs resolve through the system tz database, or the tzdata package where there is none (Windows).
+    """
+    value = value.strip()
+    if parameters.get("VALUE") == "DATE" or re.fullmatch(r"\d{8}", value):
+        day = datetime.strptime(value[:8], "%Y%m%d").date()
+        return datetime.combine(day, datetime.min.time()), True
+
+    parsed = datetime.strptime(value.rstrip("Z")[:15], "%Y%m%dT%H%M%S")
+    if value.endswith("Z"):
+        return parsed, False
+    tzid = parameters.get("TZID")
+    if tzid:
+        try:
+            return to_utc(parsed.replace(tzinfo=ZoneInfo(tzid.strip('"')))), False
+        except (ZoneInfoNotFoundError, ValueError):
+            logger.warning(f"Unknown TZID {tzid!r}; treating {value} as UTC")
+    return parsed, False
+
+
+def _parse_duration(value: str) -> timedelta:
+    match = _DURATION.match(value.strip())
+    if not match:
+        raise ValueError(f"Invalid DURATION: {value}")
+    sign, weeks, days, hours, minutes, seconds = match.groups()
+    duration = timedelta(
+        weeks=int(weeks or 0), days=int(days or 0),
+        hours=int(hours or 0), minutes=int(minutes or 0), seconds=int(seconds or 0),
+    )
+    return -duration if sign == "-" else duration
+
+
+def _build_event(properties: Dict[str, Tuple[str, Dict[str, str]]]) -> Optional[Dict]:
+    if "DTSTART" not in properties:
+        return None
+    if properties.get("STATUS", ("", {}))[0].strip().upper() == "CANCELLED":
+        return None
+
+    start, all_day = _parse_ics_datetime(*properties["DTSTART"])
+    if "DTEND" in properties:
+        end, _ = _parse_ics_datetime(*properties["DTEND"])
+    elif "DURATION" in properties:
+        end = start + _parse_duration(properties["DURATION"][0])
+    else:
+        # RFC 5545: a DATE start without an end lasts one day; a DATE-TIME start has zero duration
+        end = start + timedelta(days=1) if all_day else start
+    if end < start:
+        return None
+
+    def text_value(name: str) -> Optional[str]:
+        return _unescape(properties[name][0]) if name in properties else None
+
+    uid = text_value("UID")
+    if uid and "RECURRENCE-ID" in properties:
+        # An override of one occurrence shares its series' UID
+        uid = f"{uid}#{properties['RECURRENCE-ID'][0].strip()}"
+
+    return {
+        "uid": uid,
+        "summary": text_value("SUMMARY"),
+        "location": text_value("LOCATION"),
+        "description": text_value("DESCRIPTION"),
+        "start_time": start,
+        "end_time": end,
+    }
+
+
+def parse_ics(content: str) -> Dict:
+    """
+    Extract VEVENTs from an iCalendar file. Recurring events are imported as their first
+    occurrence (RRULE is not expanded) and counted so callers can report it.
+    """
+    # Unfold continuation lines (CRLF or LF followed by a space or tab)
+    content = re.sub(r"\r?\n[ \t]", "", content)
+
+    events: List[Dict] = []
+    recurring = 0
+    skipped = 0
+    properties: Optional[Dict[str, Tuple[str, Dict[str, str]]]] = None
+    nested = 0  # depth of sub-components (VALARM) inside the current VEVENT
+
+    for line in content.splitlines():
+        match = _CONTENT_LINE.match(line)
+        if not match:
+            continue
+        name, raw_parameters, value = match.group(1).upper(), match.group(2), match.group(3)
+
+        if name == "BEGIN":
+            if value.strip().upper() == "VEVENT" and properties is None:
+                properties, nested = {}, 0
+            elif properties is not None:
+                nested += 1
+            continue
+        if name == "END":
+            if properties is not None and nested:
+                nested -= 1
+            elif properties is not None and value.strip().upper() == "VEVENT":
+                try:
+                    event = _build_event(properties)
+                except ValueError:
+                    event = None
+                if event is None:
+                    skipped += 1
+                else:
+                    events.append(event)
+                    recurring += "RRULE" in properties
+                properties = None
+            continue
+
+        if properties is None or nested or name in properties:
+            continue
+        parameters = {key.upper(): param.strip('"') for key, param in _PARAMETER.findall(raw_parameters)}
+        properties[name] = (value, parameters)
+
+    return {"events": events, "recurring": recurring, "skipped": skipped}
@@ -0,0 +1,429 @@
+import asyncio
+import hashlib
+import io
+import logging
+import os
+import re
+from collections import OrderedDict
+from typing import AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+import pytesseract
+from fastapi import HTTPException
+from pdfminer.converter import TextConverter
+from pdfminer.layout import LAParams
+from pdfminer.pdfinterp import PDFPageInterpreter, PDFResourceManager
+from pdfminer.pdfpage import PDFPage
+from PIL import Image
+
+from backend.llm_provider import get_llm_response, is_llm_error
+from backend.tracing import span
+
+logger = logging.getLogger(__name__)
+pytesseract.pytesseract.tesseract_cmd = r"C:/Program Files/Tesseract-OCR/tesseract.exe"
+
+SUPPORTED_EXTENSIONS = [".pdf", ".png", ".jpg", ".jpeg"]
+MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB limit
+UPLOAD_BATCH_MAX_FILES = 10
+UPLOAD_BATCH_CONCURRENCY = int(os.getenv("UPLOAD_BATCH_CONCURRENCY", "3"))
+
+# Map-reduce summarization settings
+CHARS_PER_TOKEN = 4
+SUMMARY_CHUNK_TOKENS = int(os.getenv("SUMMARY_CHUNK_TOKENS", "3000"))
+# Groq calls in flight across the whole process, shared by every upload in a batch and by
+# concurrent requests, so UPLOAD_BATCH_CONCURRENCY does not multiply it
+SUMMARY_CONCURRENCY = int(os.getenv("SUMMARY_CONCURRENCY", "4"))
+SUMMARY_CACHE_SIZE = int(os.getenv("SUMMARY_CACHE_SIZE", "2048"))
+SUMMARY_MAX_REDUCE_ROUNDS = 3
+# Failed Groq calls (rate limits on long documents) are retried with exponential backoff
+SUMMARY_RETRIES = int(os.getenv("SUMMARY_RETRIES", "2"))
+SUMMARY_RETRY_DELAY_SECONDS = float(os.getenv("SUMMARY_RETRY_DELAY_SECONDS", "2.0"))
+
+# sha256(prompt) -> summary, least recently used first.
+# Chunk prompts contain only the chunk text, so this is keyed by chunk content.
+_summary_cache: "OrderedDict[str, str]" = OrderedDict()
+
+# progress(stage, details) is always invoked on the event loop thread
+ProgressCallback = Callable[[str, Dict], None]
+
+
+def validate_upload(filename: Optional[str], file_bytes: bytes) -> str:
+    """Validate an uploaded file and return its lowercase extension"""
+    if not filename:
+        raise HTTPException(status_code=400, detail="No filename provided")
+
+    file_ext = os.path.splitext(filename)[-1].lower()
+    if file_ext not in SUPPORTED_EXTENSIONS:
+        raise HTTPException(
+            status_code=400,
+            detail="Unsupported file type. Please upload PDF, PNG, JPG, or JPEG files"
+        )
+
+    if len(file_bytes) > MAX_FILE_SIZE:
+        raise HTTPException(status_code=400, detail="File too large. Maximum size is 10MB")
+
+    if not file_bytes:
+        raise HTTPException(status_code=400, detail="Empty file uploaded")
+
+    return file_ext
+
+
+def extract_pdf_text(file_bytes: bytes, on_page: Optional[Callable[[int, int], None]] = None) -> str:
+    """
+    Extract text from a PDF page by page.
+    Same pipeline as pdfminer's extract_text, but reports (page, total_pages) after each page.
+    """
+    with io.BytesIO(file_bytes) as fp:
+        total_pages = sum(1 for _ in PDFPage.get_pages(fp))
+        fp.seek(0)
+
+        rsrcmgr = PDFResourceManager(caching=True)
+        output = io.StringIO()
+        device = TextConverter(rsrcmgr, output, laparams=LAParams())
+        try:
+            interpreter = PDFPageInterpreter(rsrcmgr, device)
+            for page_number, page in enumerate(PDFPage.get_pages(fp), start=1):
+                interpreter.process_page(page)
+                if on_page:
+                    on_page(page_number, total_pages)
+        finally:
+            device.close()
+
+        return output.getvalue()
+
+
+def extract_image_text(file_bytes: bytes) -> str:
+    """Run OCR over an image"""
+    image = Image.open(io.BytesIO(file_bytes))
+
+    # Convert to RGB if necessary
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+
+    return pytesseract.image_to_string(image)
+
+
+async def extract_text_from_file(
+    file_ext: str,
+    file_bytes: bytes,
+    progress: Optional[ProgressCallback] = None,
+) -> Tuple[str, str]:
+    """Extract text off the event loop. Returns (file_type, extracted_text)"""
+    loop = asyncio.get_running_loop()
+
+    if file_ext == ".pdf":
+        def on_page(page: int, total_pages: int):
+            if progress:
+                loop.call_soon_threadsafe(progress, "extracting", {"page": page, "total_pages": total_pages})
+
+        try:
+            with span("pdf.extract", bytes=len(file_bytes)) as attributes:
+                extracted_text = await asyncio.to_thread(extract_pdf_text, file_bytes, on_page)
+                attributes["chars"] = len(extracted_text)
+        except Exception as e:
+            logger.error(f"PDF processing error: {str(e)}")
+            raise HTTPException(status_code=500, detail=f"PDF processing failed: {str(e)}")
+
+        if not extracted_text or not extracted_text.strip():
+            raise HTTPException(status_code=400, detail="No text could be extracted from the PDF")
+
+        logger.info(f"Extracted {len(extracted_text)} characters from PDF")
+        return "pdf", extracted_text
+
+    if progress:
+        progress("extracting", {"page": 1, "total_pages": 1})
+
+    try:
+        with span("ocr.image", bytes=len(file_bytes)) as attributes:
+            extracted_text = await asyncio.to_thread(extract_image_text, file_bytes)
+            attributes["chars"] = len(extracted_text)
+    except Exception as e:
+        logger.error(f"Image processing error: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Image processing failed: {str(e)}")
+
+    if not extracted_text or not extracted_text.strip():
+        raise HTTPException(status_code=400, detail="No text could be extracted from the image")
+
+    logger.info(f"Extracted {len(extracted_text)} characters from image")
+    return "image", extracted_text
+
+
+def estimate_tokens(text: str) -> int:
+    # Rough heuristic for English text; avoids shipping a tokenizer
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def _split_oversized(block: str, max_chars: int) -> List[str]:
+    """Split a block that is too large on its own, preferring line then word boundaries"""
+    pieces: List[str] = []
+    current = ""
+    for line in block.splitlines(keepends=True):
+        while len(line) > max_chars:
+            cut = line.rfind(" ", 0, max_chars)
+            cut = cut if cut > 0 else max_chars
+            if current:
+                pieces.append(current)
+                current = ""
+            pieces.append(line[:cut])
+            line = line[cut:]
+        if len(current) + len(line) > max_chars and current:
+            pieces.append(current)
+            current = ""
+        current += line
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def split_into_chunks(text: str, max_tokens: int = SUMMARY_CHUNK_TOKENS) -> List[str]:
+    """
+    Split text into chunks under a token budget.
+    Pages (form feeds from pdfminer) and paragraphs are kept whole where they fit.
+    """
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    blocks: List[str] = []
+    for page in text.split("\f"):
+        for paragraph in re.split(r"\n\s*\n", page):
+            paragraph = paragraph.strip()
+            if not paragraph:
+                continue
+            if len(paragraph) > max_chars:
+                blocks.extend(_split_oversized(paragraph, max_chars))
+            else:
+                blocks.append(paragraph)
+
+    chunks: List[str] = []
+    current: List[str] = []
+    current_len = 0
+    for block in blocks:
+        if current and current_len + len(block) + 2 > max_chars:
+            chunks.append("\n\n".join(current))
+            current, current_len = [], 0
+        current.append(block)
+        current_len += len(block) + 2
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
+
+
+_llm_semaphore: Optional[asyncio.Semaphore] = None
+
+
+def _get_llm_semaphore() -> asyncio.Semaphore:
+    global _llm_semaphore
+    if _llm_semaphore is None:
+        _llm_semaphore = asyncio.Semaphore(SUMMARY_CONCURRENCY)
+    return _llm_semaphore
+
+
+async def _cached_llm_summary(prompt: str) -> str:
+    key = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+    if key in _summary_cache:
+        _summary_cache.move_to_end(key)
+        return _summary_cache[key]
+
+    for attempt in range(SUMMARY_RETRIES + 1):
+        if attempt:
+            await asyncio.sleep(SUMMARY_RETRY_DELAY_SECONDS * 2 ** (attempt - 1))
+        async with _get_llm_semaphore():
+            with span("summary.llm_call", prompt_chars=len(prompt), attempt=attempt):
+                summary = await get_llm_response(prompt)
+        if not is_llm_error(summary):
+            break
+
+    # Never cache Groq failures
+    if not is_llm_error(summary):
+        _summary_cache[key] = summary
+        if len(_summary_cache) > SUMMARY_CACHE_SIZE:
+            _summary_cache.popitem(last=False)
+    return summary
+
+
+async def _reduce_summaries(
+    summaries: List[str],
+    subject: str = "consecutive sections of one document",
+    whole: str = "the whole document",
+) -> str:
+    """Merge partial summaries, in rounds if they do not fit one prompt. Returns the LLM error if a round fails"""
+    for round_number in range(1, SUMMARY_MAX_REDUCE_ROUNDS + 1):
+        combined = "\n\n".join(summaries)
+        if estimate_tokens(combined) <= SUMMARY_CHUNK_TOKENS or round_number == SUMMARY_MAX_REDUCE_ROUNDS:
+            return await _cached_llm_summary(f"""The following are summaries of {subject}. Combine them into a single clear and concise summary of {whole}:
+
+{combined}
+
+Summary:""")
+
+        groups = split_into_chunks("\n\n".join(summaries))
+        if len(groups) >= len(summaries):
+            # Summaries are individually too large to group; summarize each on its own
+            groups = summaries
+
+        async def reduce_group(group: str) -> str:
+            return await _cached_llm_summary(f"""The following are summaries of {subject}. Combine them into a single concise summary:
+
+{group}
+
+Summary:""")
+
+        summaries = await asyncio.gather(*(reduce_group(group) for group in groups))
+        # Never reduce over error text
+        errors = [summary for summary in summaries if is_llm_error(summary)]
+        if errors:
+            return errors[0]
+
+
+async def summarize_text(extracted_text: str, progress: Optional[ProgressCallback] = None) -> Tuple[str, str]:
+    """
+    Summarize extracted text with the LLM using map-reduce.
+    Chunks are summarized concurrently (bounded by SUMMARY_CONCURRENCY) and cached by content hash,
+    so re-uploads and edited documents only pay for changed chunks.
+    Returns (summary, status): status is "complete", "incomplete" (some sections failed and are
+    left out, which the summary says) or "failed".
+    """
+    try:
+        chunks = split_into_chunks(extracted_text)
+        if not chunks:
+            raise ValueError("No text to summarize")
+
+        if progress:
+            progress("summarizing", {"chunk": 0, "total_chunks": len(chunks)})
+
+        if len(chunks) == 1:
+            summary = await _cached_llm_summary(f"""Please provide a clear and concise summary of the following document:
+
+{chunks[0]}
+
+Summary:""")
+            if progress:
+                progress("summarizing", {"chunk": 1, "total_chunks": 1})
+            if is_llm_error(summary):
+                return f"Could not generate summary: {summary}", "failed"
+            return summary, "complete"
+
+        completed = 0
+
+        async def summarize_chunk(chunk: str) -> str:
+            nonlocal completed
+            summary = await _cached_llm_summary(f"""Please provide a concise summary of the following section of a longer document. Keep names, figures, dates and obligations:
+
+{chunk}
+
+Summary:""")
+            completed += 1
+            if progress:
+                progress("summarizing", {"chunk": completed, "total_chunks": len(chunks)})
+            return summary
+
+        with span("summary.map", chunks=len(chunks)):
+            chunk_summaries = await asyncio.gather(
+                *(summarize_chunk(chunk) for chunk in chunks)
+            )
+
+        # Sections that still failed after retries are left out of the reduce, and the summary says so
+        succeeded = [summary for summary in chunk_summaries if not is_llm_error(summary)]
+        failed = len(chunks) - len(succeeded)
+        if not succeeded:
+            return f"Could not generate summary: {chunk_summaries[0]}", "failed"
+        if failed:
+            logger.warning(f"Summary incomplete: {failed}/{len(chunks)} sections failed")
+
+        if progress:
+            progress("reducing", {"total_chunks": len(chunks)})
+        with span("summary.reduce", chunks=len(succeeded), failed_chunks=failed):
+            summary = await _reduce_summaries(succeeded)
+        if is_llm_error(summary):
+            return f"Could not generate summary: {summary}", "failed"
+        if failed:
+            return (
+                f"⚠️ Summary incomplete: {failed}/{len(chunks)} sections could not be summarized "
+                f"and are not covered below.\n\n{summary}"
+            ), "incomplete"
+        return summary, "complete"
+
+    except Exception as e:
+        logger.error(f"LLM summary error: {str(e)}")
+        # Fallback: return extracted text if summary fails
+        return f"Could not generate summary: {str(e)}/n/nExtracted text available below.", "failed"
+
+
+async def process_upload(
+    filename: str,
+    file_bytes: bytes,
+    progress: Optional[ProgressCallback] = None,
+) -> Dict:
+    """Validate, extract and summarize a single uploaded file"""
+    file_ext = validate_upload(filename, file_bytes)
+
+    file_type, extracted_text = await extract_text_from_file(file_ext, file_bytes, progress)
+
+    summary, summary_status = await summarize_text(extracted_text, progress)
+
+    return {
+        "type": file_type,
+        "filename": filename,
+        "content": summary,
+        "summary_status": summary_status,
+        "extracted_text": extracted_text,
+        "text_length": len(extracted_text),
+        "status": "success"
+    }
+
+
+async def summarize_documents(results: List[Dict]) -> str:
+    """One summary across several processed uploads, reduced from their per-file summaries"""
+    summaries = [
+        f"Document: {result['filename']}\n{result['content']}"
+        for result in results if result.get("summary_status") != "failed"
+    ]
+    if not summaries:
+        return "Could not generate combined summary: no document could be summarized"
+    try:
+        with span("summary.combine", documents=len(results)):
+            summary = await _reduce_summaries(summaries, "separate documents uploaded together", "all of the documents")
+        return f"Could not generate combined summary: {summary}" if is_llm_error(summary) else summary
+    except Exception as e:
+        logger.error(f"LLM combined summary error: {str(e)}")
+        return f"Could not generate combined summary: {str(e)}"
+
+
+async def process_upload_batch(
+    files: List[Tuple[str, bytes]],
+    combined_summary: bool = False,
+) -> AsyncIterator[Dict]:
+    """
+    Process several uploads through a bounded pool, yielding each file's result as soon as it completes.
+    A failing file is reported in its own result and does not stop the batch.
+    """
+    semaphore = asyncio.Semaphore(UPLOAD_BATCH_CONCURRENCY)
+
+    async def run(index: int, filename: str, file_bytes: bytes) -> Dict:
+        async with semaphore:
+            try:
+                with span("upload.file", filename=filename, bytes=len(file_bytes)):
+                    result = await process_upload(filename, file_bytes)
+                return {"event": "file", "index": index, **result}
+            except HTTPException as e:
+                return {"event": "file", "index": index, "filename": filename, "status": "failed", "error": e.detail}
+            except Exception as e:
+                logger.error(f"Batch upload error for {filename}: {str(e)}")
+                return {"event": "file", "index": index, "filename": filename, "status": "failed",
+                        "error": f"File processing failed: {str(e)}"}
+
+    tasks = [asyncio.create_task(run(index, filename, file_bytes)) for index, (filename, file_bytes) in enumerate(files)]
+    succeeded: List[Dict] = []
+    try:
+        for next_result in asyncio.as_completed(tasks):
+            result = await next_result
+            if result["status"] == "success":
+                succeeded.append(result)
+            yield result
+    finally:
+        # Client went away mid-stream: stop the remaining work
+        for task in tasks:
+            task.cancel()
+
+    if combined_summary and len(succeeded) > 1:
+        succeeded.sort(key=lambda result: result["index"])
+        yield {"event": "combined", "content": await summarize_documents(succeeded)}
+
+    yield {"event": "done", "succeeded": len(succeeded), "failed": len(files) - len(succeeded)}
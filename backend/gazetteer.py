@@ -0,0 +1,85 @@
+# Local city gazetteer: a character trie over a bundled city list and its aliases
+import csv
+import os
+import re
+from typing import Dict, List, Optional
+
+from backend.trie import PhraseTrie, normalize_text
+
+CITIES_FILE = os.path.join(os.path.dirname(__file__), "data", "cities.csv")
+
+# "in <place>" / "for <place>" / "at <place>", for places outside the bundled list
+_LOCATION_PHRASE = re.compile(r"\b(?:in|for|at)\s+([A-Za-z][A-Za-z.,'\- ]*)")
+# Trailing words that are part of the question, not the place ("in Springfield today")
+_TRAILING_WORDS = {
+    "today", "tonight", "tomorrow", "now", "right", "currently", "please", "this", "next",
+    "week", "weekend", "morning", "afternoon", "evening", "like", "outside",
+}
+MAX_LOCATION_WORDS = 4
+
+# Names that are also everyday words; in free text they only count when capitalized
+COMMON_WORD_NAMES = {"nice", "male", "la", "dc", "sf", "sg", "hk", "kl", "rio", "salvador", "phoenix", "bali", "goa"}
+
+
+class CityTrie(PhraseTrie):
+    def __init__(self):
+        super().__init__()
+        self.cities: List[Dict[str, str]] = []
+
+    def add_city(self, name: str, country: str, aliases: List[str]):
+        city = {"name": name, "country": country, "query": f"{name}, {country}"}
+        self.cities.append(city)
+        for alias in [name, *aliases]:
+            self.add(alias, city)
+
+    def find_in_text(self, text: str) -> Optional[Dict[str, str]]:
+        """
+        Longest city name found in free text, matched on word boundaries.
+        Later mentions win ("from Pune to Mumbai" -> Mumbai), matching how people phrase "weather in X".
+        """
+        words = text.split()
+        best = None
+        for matched_text, city in self.scan(text):
+            if matched_text in COMMON_WORD_NAMES and not _is_capitalized(words, matched_text):
+                continue
+            best = city
+        return best
+
+
+def _is_capitalized(words: List[str], matched_text: str) -> bool:
+    return any(normalize_text(word) == matched_text and word[:1].isupper() for word in words)
+
+
+def _load_gazetteer() -> CityTrie:
+    trie = CityTrie()
+    with open(CITIES_FILE, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            aliases = [alias for alias in (row.get("aliases") or "").split("|") if alias]
+            trie.add_city(row["name"], row["country"], aliases)
+    return trie
+
+
+gazetteer = _load_gazetteer()
+
+
+def resolve_city(name: str) -> Optional[Dict[str, str]]:
+    return gazetteer.lookup(name)
+
+
+def find_city(text: str) -> Optional[Dict[str, str]]:
+    return gazetteer.find_in_text(text)
+
+
+def extract_location_phrase(text: str) -> Optional[str]:
+    """
+    Fallback when find_city has no match: the words after the last "in"/"for"/"at", minus trailing
+    time words ("weather in St. Louis today?" -> "St. Louis"). None when the prompt names no place.
+    """
+    matches = _LOCATION_PHRASE.findall(text)
+    if not matches:
+        return None
+    words = matches[-1].split()
+    while words and words[-1].lower().strip(".,'-") in _TRAILING_WORDS:
+        words.pop()
+    phrase = " ".join(words[:MAX_LOCATION_WORDS]).strip(" .,'-")
+    return phrase or None
@@ -0,0 +1,155 @@
+# In-memory background job queue for file uploads (can be replaced with Redis/RQ)
+import asyncio
+import logging
+import os
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from fastapi import HTTPException
+
+from backend.tracing import current_context, span, use_context
+
+logger = logging.getLogger(__name__)
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_TTL_SECONDS = int(os.getenv("JOB_TTL_SECONDS", "3600"))
+
+# job_id -> job record
+jobs: Dict[str, Dict[str, Any]] = {}
+
+# Work functions receive (job_id, progress) and return the job result
+JobFunc = Callable[[str, Callable[[str, Dict], None]], Awaitable[Dict]]
+
+_queue: Optional["asyncio.Queue[tuple]"] = None
+_workers: List[asyncio.Task] = []
+# Per-job wakeup for SSE subscribers; replaced after every event
+_updates: Dict[str, asyncio.Event] = {}
+
+
+def _public_view(job: Dict[str, Any]) -> Dict[str, Any]:
+    return {key: value for key, value in job.items() if key not in ("result", "events", "trace_context")}
+
+
+def _emit(job_id: str, stage: str, details: Optional[Dict] = None):
+    job = jobs.get(job_id)
+    if job is None:
+        return
+
+    details = details or {}
+    job["stage"] = stage
+    job["progress"] = details
+    job["updated_at"] = time.time()
+    job["events"].append({"stage": stage, "timestamp": job["updated_at"], **details})
+
+    event = _updates.pop(job_id, None)
+    if event:
+        event.set()
+
+
+def _purge_expired():
+    cutoff = time.time() - JOB_TTL_SECONDS
+    expired = [
+        job_id for job_id, job in jobs.items()
+        if job["status"] in ("done", "failed") and job["updated_at"] < cutoff
+    ]
+    for job_id in expired:
+        jobs.pop(job_id, None)
+        _updates.pop(job_id, None)
+
+
+async def _worker():
+    while True:
+        job_id, func = await _queue.get()
+        job = jobs.get(job_id)
+        try:
+            if job is None:
+                continue
+            job["status"] = "running"
+            # Continue the trace of the request that submitted the job
+            with use_context(job.get("trace_context")):
+                with span(f"job.{job['kind']}", job_id=job_id, queued_ms=round((time.time() - job["created_at"]) * 1000, 3)):
+                    result = await func(job_id, lambda stage, details=None: _emit(job_id, stage, details))
+            job["result"] = result
+            job["status"] = "done"
+            _emit(job_id, "done")
+        except HTTPException as e:
+            job["status"] = "failed"
+            job["error"] = e.detail
+            job["status_code"] = e.status_code
+            _emit(job_id, "failed", {"error": e.detail})
+        except Exception as e:
+            logger.error(f"Job {job_id} failed: {str(e)}")
+            job["status"] = "failed"
+            job["error"] = str(e)
+            _emit(job_id, "failed", {"error": str(e)})
+        finally:
+            _queue.task_done()
+
+
+def _ensure_workers():
+    global _queue
+    if _queue is None:
+        _queue = asyncio.Queue()
+    alive = [task for task in _workers if not task.done()]
+    _workers[:] = alive
+    for _ in range(JOB_WORKERS - len(alive)):
+        _workers.append(asyncio.create_task(_worker()))
+
+
+def submit_job(kind: str, func: JobFunc, **metadata) -> Dict[str, Any]:
+    """Queue work for the background workers and return the job record immediately"""
+    _purge_expired()
+    _ensure_workers()
+
+    job_id = str(uuid.uuid4())
+    now = time.time()
+    jobs[job_id] = {
+        "job_id": job_id,
+        "kind": kind,
+        "status": "queued",
+        "stage": "received",
+        "progress": {},
+        "error": None,
+        "created_at": now,
+        "updated_at": now,
+        "events": [{"stage": "received", "timestamp": now}],
+        "result": None,
+        "trace_context": current_context(),
+        **metadata,
+    }
+    _queue.put_nowait((job_id, func))
+    logger.info(f"Queued {kind} job {job_id}")
+    return _public_view(jobs[job_id])
+
+
+def get_job(job_id: str) -> Dict[str, Any]:
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+def get_job_status(job_id: str) -> Dict[str, Any]:
+    return _public_view(get_job(job_id))
+
+
+async def job_events(job_id: str, timeout: float = 15.0):
+    """Yield job events as they happen (replaying past ones first) until the job finishes"""
+    job = get_job(job_id)
+    sent = 0
+    while True:
+        events = job["events"]
+        while sent < len(events):
+            yield events[sent]
+            sent += 1
+
+        if job["status"] in ("done", "failed"):
+            return
+
+        event = _updates.setdefault(job_id, asyncio.Event())
+        try:
+            await asyncio.wait_for(event.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            # Heartbeat so proxies keep the connection open
+            yield None
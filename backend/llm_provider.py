@@ -1,11 +1,16 @@
 import os
 import httpx
 from dotenv import load_dotenv
+from backend.tracing import span
 
 load_dotenv()
 
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 
+def is_llm_error(response: str) -> bool:
+    """get_llm_response reports Groq failures in-band as "Error: ..." text rather than raising"""
+    return response.startswith("Error:")
+
 async def get_llm_response(prompt: str) -> str:
     headers = {"Authorization": f"Bearer {GROQ_API_KEY}"}
     data = {
@@ -15,12 +20,14 @@ async def get_llm_response(prompt: str) -> str:
     }
 
     async with httpx.AsyncClient() as client:
-        response = await client.post(
-            "https://api.groq.com/openai/v1/chat/completions",
-            headers=headers,
-            json=data,
-            timeout=15
-        )
+        with span("groq.chat_completion", model=data["model"], prompt_chars=len(prompt)) as attributes:
+            response = await client.post(
+                "https://api.groq.com/openai/v1/chat/completions",
+                headers=headers,
+                json=data,
+                timeout=15
+            )
+            attributes["status_code"] = response.status_code
 
         try:
             res_json = response.json()
@@ -1,30 +1,40 @@
 # main.py
 
-from fastapi import FastAPI, Query, UploadFile, File, HTTPException
+from fastapi import FastAPI, Query, UploadFile, File, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from backend.llm_provider import get_llm_response
+from backend.semantic_cache import get_cached_llm_response
 from backend.routes.weather import get_weather
-from backend.routes.stocks import get_stock_info
-from backend.routes import calendar
+from backend.routes.stocks import get_stock_info, get_stock_bars, get_stock_batch, STOCK_BATCH_MAX_SYMBOLS
+from backend.routes import calendar, history
 from backend.admin_routes import router as admin_router
+from backend.database import Base, engine
+from backend.models import stock_bar  # noqa: F401 (registers table)
+from backend.models.chat_history import ensure_history_indexes
+from backend.models.calendar_event import ensure_calendar_indexes
+from backend.file_processing import process_upload, process_upload_batch, validate_upload, UPLOAD_BATCH_MAX_FILES
+from backend.jobs import submit_job, get_job, get_job_status, job_events
+from backend.tracing import start_trace, span, trace_context_from_headers, current_trace_id, CORRELATION_HEADER
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
-import pytesseract
-from pdfminer.high_level import extract_text
-from PIL import Image
-import io
+import json
 import os
-import tempfile
+import re
 import logging
-from typing import Dict, Any
+from datetime import datetime
+from typing import List, Optional
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
-pytesseract.pytesseract.tesseract_cmd = r"C:/Program Files/Tesseract-OCR/tesseract.exe"
 
 app = FastAPI(title="Multi-Domain Chat API", version="1.0.0")
 
+# Create local tables (stock bars, calendar events, ...) if missing
+Base.metadata.create_all(bind=engine)
+ensure_history_indexes(engine)
+ensure_calendar_indexes(engine)
+
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -34,6 +44,16 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Request tracing: continue the caller's correlation ID (or start one) and time every route
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    with start_trace(**trace_context_from_headers(request.headers)):
+        with span(f"{request.method} {request.url.path}", method=request.method, path=request.url.path) as attributes:
+            response = await call_next(request)
+            attributes["status_code"] = response.status_code
+        response.headers[CORRELATION_HEADER] = current_trace_id()
+    return response
+
 # Static files and templates
 if os.path.exists("backend/templates"):
     app.mount("/static", StaticFiles(directory="backend/templates"), name="static")
@@ -42,6 +62,7 @@ if os.path.exists("backend/templates"):
 # Include routers
 app.include_router(admin_router)
 app.include_router(calendar.router)
+app.include_router(history.router)
 
 # Health check endpoint
 @app.get("/health")
@@ -50,10 +71,16 @@ async def health_check():
 
 # Chat endpoint
 @app.get("/chat")
-async def chat(prompt: str = Query(..., description="User prompt for chat")):
+async def chat(
+    prompt: str = Query(..., description="User prompt for chat"),
+    category: Optional[str] = Query(None, description="Chat category; enables the semantic cache if opted in"),
+    question: Optional[str] = Query(None, description="Bare user question used for semantic cache matching"),
+):
     try:
         logger.info(f"Chat request: {prompt[:100]}...")
-        response = await get_llm_response(prompt)
+        response, similarity = await get_cached_llm_response(prompt, category, question)
+        if similarity is not None:
+            return {"response": response, "cached": True, "similarity": round(similarity, 4)}
         return {"response": response}
     except Exception as e:
         logger.error(f"Chat error: {str(e)}")
@@ -81,6 +108,46 @@ async def stock(symbol: str = Query(..., description="Stock symbol")):
         logger.error(f"Stock error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Stock service failed: {str(e)}")
 
+# Batched multi-symbol quotes
+@app.get("/stock/batch")
+async def stock_batch(symbols: str = Query(..., description="Comma-separated stock symbols")):
+    symbol_list = [symbol.strip().upper() for symbol in symbols.split(",") if symbol.strip()]
+    if not symbol_list:
+        raise HTTPException(status_code=400, detail="No symbols provided")
+    if len(symbol_list) > STOCK_BATCH_MAX_SYMBOLS:
+        raise HTTPException(status_code=400, detail=f"At most {STOCK_BATCH_MAX_SYMBOLS} symbols per request")
+    invalid = [symbol for symbol in symbol_list if not re.fullmatch(r"[A-Z][A-Z0-9.\-]{0,9}", symbol)]
+    if invalid:
+        raise HTTPException(status_code=400, detail=f"Invalid symbols: {', '.join(invalid)}")
+
+    try:
+        logger.info(f"Stock batch request for symbols: {symbol_list}")
+        return await get_stock_batch(symbol_list)
+    except Exception as e:
+        logger.error(f"Stock batch error: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Stock service failed: {str(e)}")
+
+# Stored intraday bars with indicators (VWAP, SMA, returns)
+@app.get("/stock/bars")
+async def stock_bars(
+    symbol: str = Query(..., description="Stock symbol"),
+    limit: int = Query(100, ge=1, le=5000, description="Most recent bars to return"),
+    start: Optional[datetime] = Query(None, description="Window start (inclusive)"),
+    end: Optional[datetime] = Query(None, description="Window end (inclusive)"),
+    sma: str = Query("5,20", description="Comma-separated SMA windows"),
+):
+    try:
+        sma_windows = [int(window) for window in sma.split(",") if window.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="sma must be comma-separated integers")
+
+    try:
+        logger.info(f"Stock bars request for symbol: {symbol}")
+        return await get_stock_bars(symbol, limit, start, end, sma_windows)
+    except Exception as e:
+        logger.error(f"Stock bars error: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Stock service failed: {str(e)}")
+
 # Categories endpoint
 @app.get("/categories/{category}")
 async def get_category_config(category: str):
@@ -122,104 +189,8 @@ async def upload_file(file: UploadFile = File(...)):
     """
     try:
         logger.info(f"File upload request: {file.filename}, type: {file.content_type}")
-        
-        # Validate file
-        if not file.filename:
-            raise HTTPException(status_code=400, detail="No filename provided")
-        
-        file_ext = os.path.splitext(file.filename)[-1].lower()
-        if file_ext not in [".pdf", ".png", ".jpg", ".jpeg"]:
-            raise HTTPException(
-                status_code=400, 
-                detail="Unsupported file type. Please upload PDF, PNG, JPG, or JPEG files"
-            )
-        
-        # Check file size (limit to 10MB)
         file_bytes = await file.read()
-        if len(file_bytes) > 10 * 1024 * 1024:  # 10MB limit
-            raise HTTPException(status_code=400, detail="File too large. Maximum size is 10MB")
-        
-        if not file_bytes:
-            raise HTTPException(status_code=400, detail="Empty file uploaded")
-
-        extracted_text = ""
-        file_type = ""
-
-        if file_ext == ".pdf":
-            file_type = "pdf"
-            # Create temporary file for PDF processing
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp_file:
-                tmp_file.write(file_bytes)
-                tmp_path = tmp_file.name
-            
-            try:
-                # Extract text from PDF
-                extracted_text = extract_text(tmp_path)
-                
-                if not extracted_text or not extracted_text.strip():
-                    raise HTTPException(status_code=400, detail="No text could be extracted from the PDF")
-                
-                logger.info(f"Extracted {len(extracted_text)} characters from PDF")
-                
-            except Exception as e:
-                logger.error(f"PDF processing error: {str(e)}")
-                raise HTTPException(status_code=500, detail=f"PDF processing failed: {str(e)}")
-            finally:
-                # Clean up temporary file
-                try:
-                    if os.path.exists(tmp_path):
-                        os.remove(tmp_path)
-                except Exception as e:
-                    logger.warning(f"Could not remove temp file: {str(e)}")
-
-        elif file_ext in [".png", ".jpg", ".jpeg"]:
-            file_type = "image"
-            try:
-                # Process image with OCR
-                image = Image.open(io.BytesIO(file_bytes))
-                
-                # Convert to RGB if necessary
-                if image.mode != 'RGB':
-                    image = image.convert('RGB')
-                
-                extracted_text = pytesseract.image_to_string(image)
-                
-                if not extracted_text or not extracted_text.strip():
-                    raise HTTPException(status_code=400, detail="No text could be extracted from the image")
-                
-                logger.info(f"Extracted {len(extracted_text)} characters from image")
-                
-            except Exception as e:
-                logger.error(f"Image processing error: {str(e)}")
-                raise HTTPException(status_code=500, detail=f"Image processing failed: {str(e)}")
-
-        # Limit text length for LLM processing (prevent token limit issues)
-        if len(extracted_text) > 15000:
-            extracted_text = extracted_text[:15000] + "/n/n[Text truncated due to length...]"
-
-        # Generate summary using LLM
-        try:
-            summary_prompt = f"""Please provide a clear and concise summary of the following document:
-
-{extracted_text}
-
-Summary:"""
-            
-            summary = await get_llm_response(summary_prompt)
-            
-        except Exception as e:
-            logger.error(f"LLM summary error: {str(e)}")
-            # Fallback: return extracted text if summary fails
-            summary = f"Could not generate summary: {str(e)}/n/nExtracted text available below."
-
-        return {
-            "type": file_type,
-            "filename": file.filename,
-            "content": summary,
-            "extracted_text": extracted_text,
-            "text_length": len(extracted_text),
-            "status": "success"
-        }
+        return await process_upload(file.filename, file_bytes)
 
     except HTTPException:
         # Re-raise HTTP exceptions
@@ -228,27 +199,93 @@ Summary:"""
         logger.error(f"Unexpected upload error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"File processing failed: {str(e)}")
 
-# Chat history endpoint
-@app.post("/chat-history")
-async def store_chat_history(data: Dict[Any, Any]):
-    """Store chat history (implement according to your storage needs)"""
-    try:
-        # Log the chat history (you can implement database storage here)
-        logger.info(f"Chat history stored for session: {data.get('session_id')}")
-        return {"status": "stored", "session_id": data.get("session_id")}
-    except Exception as e:
-        logger.error(f"Chat history storage error: {str(e)}")
-        return {"status": "failed", "error": str(e)}
+# Batch upload: several files processed concurrently, results streamed as NDJSON as each completes
+@app.post("/upload-files")
+async def upload_files(
+    files: List[UploadFile] = File(...),
+    combined_summary: bool = Query(False, description="Also summarize all files together"),
+):
+    """
+    Upload several PDF or image files at once.
+    Streams one JSON line per file ({"event": "file", ...}) in completion order,
+    then {"event": "combined", ...} if requested, then {"event": "done", ...}
+    """
+    if len(files) > UPLOAD_BATCH_MAX_FILES:
+        raise HTTPException(status_code=400, detail=f"Too many files. Maximum is {UPLOAD_BATCH_MAX_FILES} per batch")
+
+    logger.info(f"Batch upload request: {[file.filename for file in files]}")
+    payloads = [(file.filename, await file.read()) for file in files]
+
+    async def result_stream():
+        async for result in process_upload_batch(payloads, combined_summary):
+            yield json.dumps(result) + "\n"
+
+    return StreamingResponse(result_stream(), media_type="application/x-ndjson")
+
+# Asynchronous file upload: returns a job id immediately, work runs in the background
+@app.post("/upload-jobs", status_code=202)
+async def create_upload_job(file: UploadFile = File(...)):
+    """
+    Queue a PDF or image for processing.
+    Poll /jobs/{job_id} or subscribe to /jobs/{job_id}/events, then fetch /jobs/{job_id}/result
+    """
+    logger.info(f"Upload job request: {file.filename}, type: {file.content_type}")
+    file_bytes = await file.read()
+    filename = file.filename
+
+    # Reject bad uploads up front instead of failing the job later
+    validate_upload(filename, file_bytes)
+
+    async def run(job_id, progress):
+        return await process_upload(filename, file_bytes, progress)
+
+    return submit_job("upload", run, filename=filename)
+
+@app.get("/jobs/{job_id}")
+async def job_status(job_id: str):
+    return get_job_status(job_id)
+
+@app.get("/jobs/{job_id}/result")
+async def job_result(job_id: str):
+    job = get_job(job_id)
+    if job["status"] == "failed":
+        # Client errors (e.g. no extractable text) keep their original 4xx status
+        raise HTTPException(status_code=job.get("status_code", 500), detail=f"File processing failed: {job['error']}")
+    if job["status"] != "done":
+        raise HTTPException(status_code=409, detail=f"Job is still {job['status']}")
+    return job["result"]
+
+@app.get("/jobs/{job_id}/events")
+async def job_progress_events(job_id: str):
+    """Server-Sent Events stream of job stage progress"""
+    get_job(job_id)  # 404 before the stream starts
+
+    async def event_stream():
+        async for event in job_events(job_id):
+            if event is None:
+                yield ": keep-alive\n\n"
+            else:
+                yield f"event: {event['stage']}\ndata: {json.dumps(event)}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 # Error handlers
 @app.exception_handler(404)
 async def not_found_handler(request, exc):
-    return {"error": "Endpoint not found", "detail": str(exc)}
+    detail = getattr(exc, "detail", str(exc))
+    # 404s raised by a matched route (e.g. "Job not found") are passed through unchanged
+    if "route" in request.scope:
+        return JSONResponse(status_code=404, content={"detail": detail})
+    return JSONResponse(status_code=404, content={"error": "Endpoint not found", "detail": detail})
 
 @app.exception_handler(500)
 async def server_error_handler(request, exc):
     logger.error(f"Server error: {str(exc)}")
-    return {"error": "Internal server error", "detail": "Something went wrong"}
+    return JSONResponse(status_code=500, content={"error": "Internal server error", "detail": "Something went wrong"})
 
 if __name__ == "__main__":
     import uvicorn
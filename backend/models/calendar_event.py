@@ -0,0 +1,61 @@
+import zlib
+from sqlalchemy import Column, Integer, String, DateTime, Index, text
+from backend.database import Base
+
+class CalendarEvent(Base):
+    __tablename__ = "calendar_events"
+    __table_args__ = (
+        # Re-importing a calendar updates events by their iCalendar UID instead of duplicating them
+        Index("ux_calendar_events_session_uid", "session_id", "uid", unique=True),
+    )
+
+    id = Column(Integer, primary_key=True)
+    session_id = Column(String, nullable=False, default="")
+    # crc32 of session_id; the interval index's first dimension (collisions are filtered on session_id)
+    session_key = Column(Integer, nullable=False, default=0)
+    uid = Column(String)
+    summary = Column(String)
+    location = Column(String)
+    description = Column(String)
+    # Naive UTC, half-open [start_time, end_time)
+    start_time = Column(DateTime, nullable=False)
+    end_time = Column(DateTime, nullable=False)
+
+def session_key(session_id: str) -> int:
+    return zlib.crc32((session_id or "").encode("utf-8")) & 0x7FFFFFFF
+
+# R*Tree over (session_key, [start minute, end minute]), kept in sync by triggers.
+# Bounds are widened to whole minutes, so it returns a superset that queries re-check exactly.
+_START_MINUTE = "CAST(strftime('%s', new.start_time) AS INTEGER) / 60"
+_END_MINUTE = "(CAST(strftime('%s', new.end_time) AS INTEGER) + 59) / 60"
+_INDEX_ROW = f"new.id, new.session_key, new.session_key, {_START_MINUTE}, {_END_MINUTE}"
+
+RTREE_STATEMENTS = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS calendar_events_rtree USING rtree_i32(
+        id, session_min, session_max, start_minute, end_minute
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS calendar_events_rtree_insert AFTER INSERT ON calendar_events BEGIN
+        INSERT INTO calendar_events_rtree VALUES ({_INDEX_ROW});
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS calendar_events_rtree_delete AFTER DELETE ON calendar_events BEGIN
+        DELETE FROM calendar_events_rtree WHERE id = old.id;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS calendar_events_rtree_update AFTER UPDATE ON calendar_events BEGIN
+        DELETE FROM calendar_events_rtree WHERE id = old.id;
+        INSERT INTO calendar_events_rtree VALUES ({_INDEX_ROW});
+    END""",
+]
+
+def ensure_calendar_indexes(engine):
+    """Create the interval index, backfilling it for databases that predate it"""
+    with engine.begin() as conn:
+        rtree_exists = conn.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'calendar_events_rtree'")
+        ).first()
+        for statement in RTREE_STATEMENTS:
+            conn.execute(text(statement))
+        if not rtree_exists:
+            conn.execute(text(
+                "INSERT INTO calendar_events_rtree "
+                f"SELECT {_INDEX_ROW.replace('new.', '')} FROM calendar_events"
+            ))
@@ -1,12 +1,48 @@
-from sqlalchemy import Column, Integer, String, DateTime
+from sqlalchemy import Column, Integer, String, DateTime, Index, text
 from backend.database import Base
 from datetime import datetime
 
 class ChatHistory(Base):
     __tablename__ = "chat_history"
+    __table_args__ = (
+        # Serves keyset pagination on (session_id, timestamp, id)
+        Index("ix_chat_history_session_timestamp", "session_id", "timestamp", "id"),
+        # Serves newest-first pages across all sessions (admin dashboard)
+        Index("ix_chat_history_timestamp", "timestamp", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     session_id = Column(String, index=True)
     prompt = Column(String)
     response = Column(String)
     timestamp = Column(DateTime, default=datetime.now)
+
+# External-content FTS5 index over prompt/response, kept in sync by triggers
+FTS_STATEMENTS = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS chat_history_fts USING fts5(
+        prompt, response, content='chat_history', content_rowid='id'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS chat_history_fts_insert AFTER INSERT ON chat_history BEGIN
+        INSERT INTO chat_history_fts(rowid, prompt, response) VALUES (new.id, new.prompt, new.response);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS chat_history_fts_delete AFTER DELETE ON chat_history BEGIN
+        INSERT INTO chat_history_fts(chat_history_fts, rowid, prompt, response) VALUES ('delete', old.id, old.prompt, old.response);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS chat_history_fts_update AFTER UPDATE ON chat_history BEGIN
+        INSERT INTO chat_history_fts(chat_history_fts, rowid, prompt, response) VALUES ('delete', old.id, old.prompt, old.response);
+        INSERT INTO chat_history_fts(rowid, prompt, response) VALUES (new.id, new.prompt, new.response);
+    END""",
+]
+
+def ensure_history_indexes(engine):
+    """Create the composite and full-text indexes, backfilling FTS for databases that predate it"""
+    with engine.begin() as conn:
+        fts_exists = conn.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'chat_history_fts'")
+        ).first()
+        for index in ChatHistory.__table__.indexes:
+            index.create(bind=conn, checkfirst=True)
+        for statement in FTS_STATEMENTS:
+            conn.execute(text(statement))
+        if not fts_exists:
+            conn.execute(text("INSERT INTO chat_history_fts(chat_history_fts) VALUES ('rebuild')"))
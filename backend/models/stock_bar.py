@@ -0,0 +1,15 @@
+from sqlalchemy import Column, String, DateTime, Float, Integer
+from backend.database import Base
+
+class StockBar(Base):
+    __tablename__ = "stock_bars"
+
+    # One row per (symbol, interval, bar start); re-fetched bars overwrite in place
+    symbol = Column(String, primary_key=True)
+    interval = Column(String, primary_key=True)
+    timestamp = Column(DateTime, primary_key=True)
+    open = Column(Float)
+    high = Column(Float)
+    low = Column(Float)
+    close = Column(Float)
+    volume = Column(Integer)
@@ -1,12 +1,147 @@
-from fastapi import APIRouter
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from fastapi import APIRouter, File, HTTPException, Query, Request, UploadFile
+from backend.calendar_store import (
+    add_event,
+    busy_blocks,
+    conflict_groups,
+    delete_event,
+    free_slots,
+    import_events,
+    parse_datetime,
+    parse_ics,
+    query_events,
+    serialize_event,
+)
+from backend.tracing import span
 
 router = APIRouter()
 
+# Window used when /calendar-events is called without start/end
+CALENDAR_DEFAULT_DAYS = int(os.getenv("CALENDAR_DEFAULT_DAYS", "7"))
+CALENDAR_IMPORT_MAX_SIZE = 10 * 1024 * 1024  # 10MB limit
+
+def _parse_time(value: str, name: str) -> datetime:
+    try:
+        return parse_datetime(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid {name}: expected an ISO 8601 datetime")
+
+def _window(start: Optional[str], end: Optional[str]):
+    window_start = _parse_time(start, "start") if start else datetime.now(timezone.utc).replace(tzinfo=None, second=0, microsecond=0)
+    window_end = _parse_time(end, "end") if end else window_start + timedelta(days=CALENDAR_DEFAULT_DAYS)
+    if window_end <= window_start:
+        raise HTTPException(status_code=400, detail="end must be after start")
+    return window_start, window_end
+
+# Every route is scoped to one session; query_events(session_id=None) is for internal use only
+def _find_overlapping(start: datetime, end: datetime, session_id: str, limit: int = -1):
+    with span("db.calendar_events.overlap", session_id=session_id) as attributes:
+        events = query_events(start, end, session_id, limit)
+        attributes["events"] = len(events)
+    return events
+
 @router.get("/calendar-events")
-async def get_mock_events():
+def list_calendar_events(
+    start: Optional[str] = Query(None, description="ISO 8601; defaults to now (UTC)"),
+    end: Optional[str] = Query(None, description=f"ISO 8601; defaults to start + {CALENDAR_DEFAULT_DAYS} days"),
+    session_id: str = Query(..., description="Session whose events to list"),
+    limit: int = Query(500, ge=1, le=5000),
+):
+    """Events overlapping [start, end), ordered by start time"""
+    window_start, window_end = _window(start, end)
+    events = _find_overlapping(window_start, window_end, session_id, limit + 1)
+    return {
+        "start": window_start.isoformat(),
+        "end": window_end.isoformat(),
+        "events": [serialize_event(event) for event in events[:limit]],
+        "truncated": len(events) > limit,
+    }
+
+@router.post("/calendar-events", status_code=201)
+async def create_calendar_event(request: Request):
+    """Add an event; overlapping events in the same session are rejected with 409 unless allow_conflicts is set"""
+    data = await request.json()
+    if not data.get("summary") or not data.get("start") or not data.get("end"):
+        raise HTTPException(status_code=400, detail="summary, start and end are required")
+
+    start = _parse_time(data["start"], "start")
+    end = _parse_time(data["end"], "end")
+    if end < start:
+        raise HTTPException(status_code=400, detail="end must not be before start")
+    session_id = data.get("session_id")
+    if not session_id:
+        raise HTTPException(status_code=400, detail="session_id is required")
+
+    if not data.get("allow_conflicts"):
+        conflicts = _find_overlapping(start, end, session_id, limit=10)
+        if conflicts:
+            raise HTTPException(status_code=409, detail={
+                "message": "Event overlaps existing events",
+                "conflicts": [serialize_event(event) for event in conflicts],
+            })
+
+    with span("db.calendar_events.insert", session_id=session_id):
+        event = add_event(session_id, data["summary"], start, end, data.get("location"), data.get("description"))
+    return serialize_event(event)
+
+@router.delete("/calendar-events/{event_id}")
+def remove_calendar_event(event_id: int, session_id: str = Query(...)):
+    if not delete_event(event_id, session_id):
+        raise HTTPException(status_code=404, detail="Event not found")
+    return {"status": "deleted", "id": event_id}
+
+@router.get("/calendar-events/free-busy")
+def get_free_busy(
+    start: Optional[str] = Query(None),
+    end: Optional[str] = Query(None),
+    session_id: str = Query(...),
+    min_minutes: int = Query(0, ge=0, description="Only report free slots at least this long"),
+):
+    """Merged busy blocks and the free gaps between them within [start, end)"""
+    window_start, window_end = _window(start, end)
+    busy = busy_blocks(_find_overlapping(window_start, window_end, session_id), window_start, window_end)
+    free = free_slots(busy, window_start, window_end, timedelta(minutes=min_minutes))
+    return {
+        "start": window_start.isoformat(),
+        "end": window_end.isoformat(),
+        "busy": [{"start": s.isoformat(), "end": e.isoformat()} for s, e in busy],
+        "free": [{"start": s.isoformat(), "end": e.isoformat()} for s, e in free],
+    }
+
+@router.get("/calendar-events/conflicts")
+def get_conflicts(
+    start: Optional[str] = Query(None),
+    end: Optional[str] = Query(None),
+    session_id: str = Query(...),
+):
+    """Groups of overlapping events within [start, end)"""
+    window_start, window_end = _window(start, end)
+    groups = conflict_groups(_find_overlapping(window_start, window_end, session_id))
+    return {"conflicts": [[serialize_event(event) for event in group] for group in groups]}
+
+@router.post("/calendar-events/import")
+def import_calendar(
+    file: UploadFile = File(...),
+    session_id: str = Query(..., description="Session that owns the imported events"),
+):
+    """Bulk import VEVENTs from an .ics file; re-importing updates events by UID"""
+    content = file.file.read(CALENDAR_IMPORT_MAX_SIZE + 1)
+    if len(content) > CALENDAR_IMPORT_MAX_SIZE:
+        raise HTTPException(status_code=400, detail=f"File too large. Maximum size: {CALENDAR_IMPORT_MAX_SIZE / (1024*1024):.1f}MB")
+
+    with span("calendar.import", session_id=session_id, bytes=len(content)) as attributes:
+        parsed = parse_ics(content.decode("utf-8", errors="replace"))
+        if not parsed["events"] and not parsed["skipped"]:
+            raise HTTPException(status_code=400, detail="No VEVENT entries found in file")
+        imported = import_events(session_id, parsed["events"])
+        attributes["events"] = imported
+
     return {
-        "events": [
-            {"summary": "Team Sync", "start": "2025-08-05T10:00", "end": "2025-08-05T11:00"},
-            {"summary": "Client Call", "start": "2025-08-06T14:00", "end": "2025-08-06T15:00"}
-        ]
+        "status": "imported",
+        "filename": file.filename,
+        "imported": imported,
+        "recurring_not_expanded": parsed["recurring"],
+        "skipped": parsed["skipped"],
     }
@@ -1,7 +1,12 @@
-from fastapi import APIRouter, Depends, Request
+import base64
+import json
+from fastapi import APIRouter, Depends, Request, Query, HTTPException
+from sqlalchemy import text, tuple_
 from sqlalchemy.orm import Session
+from typing import Optional
 from backend.database import SessionLocal
 from backend.models.chat_history import ChatHistory
+from backend.tracing import span
 from datetime import datetime
 from backend.schemas.chat import ChatHistorySchema  # ✅ import schema
 
@@ -33,10 +38,119 @@ async def save_chat_history(request: Request, db: Session = Depends(get_db)):
     )
 
     # Save to DB
-    db.add(new_entry)
-    db.commit()
-    db.refresh(new_entry)
+    with span("db.chat_history.insert", session_id=session_id):
+        db.add(new_entry)
+        db.commit()
+        db.refresh(new_entry)
 
     return {"status": "saved", "id": new_entry.id}
 
+def _encode_cursor(payload: dict) -> str:
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
 
+def _decode_cursor(cursor: str) -> dict:
+    try:
+        return json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def _serialize(entry) -> dict:
+    # Raw SQL rows (search) carry SQLite's "YYYY-MM-DD HH:MM:SS.ffffff" text; ORM rows carry datetimes
+    timestamp = entry.timestamp
+    if isinstance(timestamp, str):
+        timestamp = datetime.fromisoformat(timestamp)
+    return {
+        "id": entry.id,
+        "session_id": entry.session_id,
+        "prompt": entry.prompt,
+        "response": entry.response,
+        "timestamp": timestamp.isoformat() if timestamp else None,
+    }
+
+def query_chat_history(db: Session, session_id: Optional[str] = None, limit: int = 50, cursor: Optional[str] = None) -> dict:
+    """
+    Newest-first keyset page on (timestamp, id); cost does not grow with page depth.
+    With a session the equality on session_id plus the range on (timestamp, id) is one seek into
+    ix_chat_history_session_timestamp; across sessions ix_chat_history_timestamp serves it.
+    """
+    query = db.query(ChatHistory)
+    if session_id:
+        query = query.filter(ChatHistory.session_id == session_id)
+
+    if cursor:
+        position = _decode_cursor(cursor)
+        try:
+            after = (datetime.fromisoformat(position["timestamp"]), int(position["id"]))
+        except (KeyError, TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        query = query.filter(tuple_(ChatHistory.timestamp, ChatHistory.id) < tuple_(*after))
+
+    rows = query.order_by(ChatHistory.timestamp.desc(), ChatHistory.id.desc()).limit(limit + 1).all()
+
+    items = [_serialize(row) for row in rows[:limit]]
+    next_cursor = None
+    if len(rows) > limit:
+        last = rows[limit - 1]
+        next_cursor = _encode_cursor({"timestamp": last.timestamp.isoformat(), "id": last.id})
+    return {"items": items, "next_cursor": next_cursor}
+
+def _fts_query(q: str) -> str:
+    # Quote every term so user input is never parsed as FTS5 syntax; a trailing * keeps prefix search
+    terms = []
+    for term in q.split():
+        prefix = term.endswith("*") and len(term) > 1
+        term = term.rstrip("*").replace('"', '""')
+        if term:
+            terms.append(f'"{term}"' + ("*" if prefix else ""))
+    return " ".join(terms)
+
+def search_chat_history_fts(db: Session, q: str, session_id: Optional[str] = None, limit: int = 50, cursor: Optional[str] = None) -> dict:
+    """FTS5 match over prompt/response, newest first, keyset-paginated on rowid"""
+    match = _fts_query(q)
+    if not match:
+        raise HTTPException(status_code=400, detail="Empty search query")
+
+    params = {"match": match, "limit": limit + 1}
+    filters = ""
+    if session_id:
+        filters += " AND h.session_id = :session_id"
+        params["session_id"] = session_id
+    if cursor:
+        try:
+            params["before_id"] = int(_decode_cursor(cursor)["id"])
+        except (KeyError, TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        filters += " AND chat_history_fts.rowid < :before_id"
+
+    rows = db.execute(text(f"""
+        SELECT h.id, h.session_id, h.prompt, h.response, h.timestamp,
+               snippet(chat_history_fts, -1, '[', ']', '...', 12) AS snippet
+        FROM chat_history_fts
+        JOIN chat_history AS h ON h.id = chat_history_fts.rowid
+        WHERE chat_history_fts MATCH :match{filters}
+        ORDER BY chat_history_fts.rowid DESC
+        LIMIT :limit
+    """), params).all()
+
+    items = [{**_serialize(row), "snippet": row.snippet} for row in rows[:limit]]
+    next_cursor = _encode_cursor({"id": rows[limit - 1].id}) if len(rows) > limit else None
+    return {"items": items, "next_cursor": next_cursor}
+
+@router.get("/chat-history")
+def list_chat_history(
+    session_id: Optional[str] = Query(None, description="Only this session"),
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    db: Session = Depends(get_db),
+):
+    return query_chat_history(db, session_id, limit, cursor)
+
+@router.get("/chat-history/search")
+def search_chat_history(
+    q: str = Query(..., description="Full-text query over prompts and responses"),
+    session_id: Optional[str] = Query(None, description="Only this session"),
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    db: Session = Depends(get_db),
+):
+    return search_chat_history_fts(db, q, session_id, limit, cursor)
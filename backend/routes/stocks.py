@@ -1,39 +1,156 @@
 import os
+import time
+import asyncio
 import httpx
+from collections import deque
+from datetime import datetime
+from typing import Dict, List, Optional
 from dotenv import load_dotenv
+from backend.tracing import span
+from backend.stock_store import (
+    parse_alpha_vantage_series,
+    merge_bars,
+    load_bars,
+    latest_bar,
+    compute_indicators,
+    to_json_list,
+)
 
 load_dotenv()
 
 STOCK_API_KEY = os.getenv("STOCK_API_KEY")
+STOCK_INTERVAL = "5min"  # You can also use 1min, 15min, etc.
+# Serve quotes from the local bar store until it is this old
+STOCK_REFRESH_SECONDS = int(os.getenv("STOCK_REFRESH_SECONDS", "300"))
+# Alpha Vantage free tier allows 5 calls per minute
+STOCK_CALLS_PER_MINUTE = int(os.getenv("STOCK_CALLS_PER_MINUTE", "5"))
+STOCK_BATCH_MAX_SYMBOLS = 10
+STOCK_BATCH_CONCURRENCY = 5
+
+# symbol -> time of the last successful Alpha Vantage fetch
+_last_fetch: Dict[str, float] = {}
+# Start times of Alpha Vantage calls in the last minute
+_recent_calls: deque = deque()
+
+def _take_rate_budget() -> bool:
+    """Reserve one Alpha Vantage call if the per-minute budget allows it"""
+    now = time.time()
+    while _recent_calls and now - _recent_calls[0] >= 60:
+        _recent_calls.popleft()
+    if len(_recent_calls) >= STOCK_CALLS_PER_MINUTE:
+        return False
+    _recent_calls.append(now)
+    return True
+
+def _needs_refresh(symbol: str) -> bool:
+    return time.time() - _last_fetch.get(symbol, 0) > STOCK_REFRESH_SECONDS
+
+async def refresh_bars(symbol: str) -> Optional[str]:
+    """Fetch the compact intraday series and merge it into the local store. Returns an error message on failure"""
+    if not _take_rate_budget():
+        return "Alpha Vantage rate budget exhausted, please try again in a minute."
 
-async def get_stock_info(symbol: str):
     url = "https://www.alphavantage.co/query"
     params = {
         "function": "TIME_SERIES_INTRADAY",
         "symbol": symbol,
-        "interval": "5min",  # You can also use 1min, 15min, etc.
+        "interval": STOCK_INTERVAL,
         "outputsize": "compact",
         "datatype": "json",
         "apikey": STOCK_API_KEY
     }
 
-    async with httpx.AsyncClient() as client:
-        res = await client.get(url, params=params)
-        data = res.json()
-
-        time_series_key = "Time Series (5min)"
-        if time_series_key not in data:
-            return {"response": f"Error: {data.get('Error Message', 'Could not fetch intraday data.')}"}
-
-        latest_timestamp = sorted(data[time_series_key].keys())[-1]
-        latest_data = data[time_series_key][latest_timestamp]
-
-        return {
-            "symbol": symbol,
-            "timestamp": latest_timestamp,
-            "open": latest_data["1. open"],
-            "high": latest_data["2. high"],
-            "low": latest_data["3. low"],
-            "close": latest_data["4. close"],
-            "volume": latest_data["5. volume"]
-        }
+    # Network failures and non-JSON bodies are reported like in-band errors, so callers fall back to local bars
+    try:
+        async with httpx.AsyncClient() as client:
+            with span("alphavantage.intraday", symbol=symbol) as attributes:
+                res = await client.get(url, params=params)
+                attributes["status_code"] = res.status_code
+            data = res.json()
+    except httpx.HTTPError as e:
+        return f"Alpha Vantage request failed: {type(e).__name__}"
+    except ValueError:
+        return "Alpha Vantage returned an invalid response."
+
+    time_series_key = f"Time Series ({STOCK_INTERVAL})"
+    if time_series_key not in data:
+        return data.get('Error Message', 'Could not fetch intraday data.')
+
+    bars = parse_alpha_vantage_series(data[time_series_key])
+    with span("db.stock_bars.merge", symbol=symbol, rows=len(bars)):
+        await asyncio.to_thread(merge_bars, symbol, STOCK_INTERVAL, bars)
+    _last_fetch[symbol] = time.time()
+    return None
+
+async def get_stock_info(symbol: str):
+    symbol = symbol.upper()
+
+    error = None
+    if _needs_refresh(symbol):
+        error = await refresh_bars(symbol)
+
+    bar = await asyncio.to_thread(latest_bar, symbol, STOCK_INTERVAL)
+    if bar is None:
+        return {"symbol": symbol, "response": f"Error: {error or 'Could not fetch intraday data.'}"}
+
+    result = {
+        "symbol": symbol,
+        "timestamp": str(bar["timestamp"]).replace("T", " "),
+        "open": f"{bar['open']:.4f}",
+        "high": f"{bar['high']:.4f}",
+        "low": f"{bar['low']:.4f}",
+        "close": f"{bar['close']:.4f}",
+        "volume": str(int(bar["volume"]))
+    }
+    if error:
+        # Upstream failed but we still have local bars; the timestamp shows how old they are
+        result["stale"] = True
+    return result
+
+async def get_stock_batch(symbols: List[str]):
+    """Quotes for several symbols, fetched concurrently; refreshes beyond the rate budget fall back to local bars"""
+    unique_symbols = list(dict.fromkeys(symbol.upper() for symbol in symbols))
+    semaphore = asyncio.Semaphore(STOCK_BATCH_CONCURRENCY)
+
+    async def fetch(symbol: str):
+        async with semaphore:
+            return await get_stock_info(symbol)
+
+    results = await asyncio.gather(*(fetch(symbol) for symbol in unique_symbols), return_exceptions=True)
+    return {
+        "results": [
+            {"symbol": symbol, "response": f"Error: {result}"} if isinstance(result, Exception) else result
+            for symbol, result in zip(unique_symbols, results)
+        ]
+    }
+
+async def get_stock_bars(
+    symbol: str,
+    limit: int = 100,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    sma_windows: Optional[List[int]] = None,
+):
+    """OHLCV window plus indicators, computed from the local store"""
+    symbol = symbol.upper()
+
+    error = None
+    if _needs_refresh(symbol):
+        error = await refresh_bars(symbol)
+
+    bars = await asyncio.to_thread(load_bars, symbol, STOCK_INTERVAL, start, end, limit)
+    if not len(bars["timestamp"]):
+        return {"response": f"Error: {error or 'No local bars for this symbol.'}"}
+
+    indicators = compute_indicators(bars, sma_windows or [])
+    result = {
+        "symbol": symbol,
+        "interval": STOCK_INTERVAL,
+        "count": len(bars["timestamp"]),
+        "bars": {column: to_json_list(values) for column, values in bars.items()},
+        "indicators": {name: to_json_list(values) for name, values in indicators.items()},
+    }
+    if error:
+        # Same as the quote path: serve local bars but flag that the refresh failed
+        result["stale"] = True
+    return result
@@ -1,9 +1,63 @@
 import httpx
 import os
+import time
+from collections import OrderedDict
+from typing import Dict, Tuple
+from backend.gazetteer import resolve_city
+from backend.trie import normalize_text
+from backend.tracing import span
+
+WEATHER_CACHE_SECONDS = int(os.getenv("WEATHER_CACHE_SECONDS", "600"))
+NEGATIVE_CACHE_SECONDS = int(os.getenv("WEATHER_NEGATIVE_CACHE_SECONDS", "86400"))
+NEGATIVE_CACHE_SIZE = 10000
+
+# WeatherAPI error code for "No matching location found."
+NO_MATCHING_LOCATION = 1006
+
+# canonical query key -> (expires_at, response)
+_weather_cache: Dict[str, Tuple[float, dict]] = {}
+# canonical query key -> expires_at, for locations WeatherAPI could not match
+_negative_cache: "OrderedDict[str, float]" = OrderedDict()
+
+def _no_match_response() -> dict:
+    # Same shape WeatherAPI returns, so callers handle both identically
+    return {"error": {"code": NO_MATCHING_LOCATION, "message": "No matching location found."}}
 
 async def get_weather(city: str):
+    # Canonicalize through the gazetteer so "bombay", "Mumbai" and "mumbai?" share one cache entry
+    match = resolve_city(city)
+    query = match["query"] if match else city.strip()
+    key = normalize_text(query)
+    if not key:
+        return _no_match_response()
+
+    now = time.time()
+    expires_at = _negative_cache.get(key)
+    if expires_at is not None:
+        if expires_at > now:
+            return _no_match_response()
+        del _negative_cache[key]
+
+    cached = _weather_cache.get(key)
+    if cached and cached[0] > now:
+        return cached[1]
+
     url = f"http://api.weatherapi.com/v1/current.json"
-    params = {"key": os.getenv("WEATHER_API_KEY"), "q": city}
+    params = {"key": os.getenv("WEATHER_API_KEY"), "q": query}
     async with httpx.AsyncClient() as client:
-        response = await client.get(url, params=params)
-        return response.json()
+        with span("weatherapi.current", query=query) as attributes:
+            response = await client.get(url, params=params)
+            attributes["status_code"] = response.status_code
+        data = response.json()
+
+    error = data.get("error") if isinstance(data, dict) else None
+    if error and error.get("code") == NO_MATCHING_LOCATION:
+        _negative_cache[key] = now + NEGATIVE_CACHE_SECONDS
+        if len(_negative_cache) > NEGATIVE_CACHE_SIZE:
+            _negative_cache.popitem(last=False)
+    elif not error:
+        # Drop expired entries lazily so the cache stays bounded by the active key set
+        for stale_key in [k for k, (exp, _) in _weather_cache.items() if exp <= now]:
+            del _weather_cache[stale_key]
+        _weather_cache[key] = (now + WEATHER_CACHE_SECONDS, data)
+    return data
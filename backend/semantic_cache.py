@@ -0,0 +1,304 @@
+# Opt-in, per-category semantic response cache: hashed bag-of-words embeddings in a NumPy matrix
+#   python -m backend.semantic_cache   (similarity search benchmark at 100k entries, plus labelled pairs)
+import os
+import re
+import time
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from backend.llm_provider import get_llm_response, is_llm_error
+from backend.tracing import span
+
+# Comma-separated categories that use the cache, e.g. "finance,real_estate"; empty disables it
+SEMANTIC_CACHE_CATEGORIES = {
+    category.strip() for category in os.getenv("SEMANTIC_CACHE_CATEGORIES", "").split(",") if category.strip()
+}
+# Set from LABELLED_PAIRS (python -m backend.semantic_cache); re-run it after changing embed()
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.77"))
+SEMANTIC_CACHE_SIZE = int(os.getenv("SEMANTIC_CACHE_SIZE", "10000"))
+SEMANTIC_CACHE_TTL_SECONDS = int(os.getenv("SEMANTIC_CACHE_TTL_SECONDS", "86400"))
+EMBEDDING_DIM = 512
+
+# Question framing carries no meaning for cache matching
+_STOPWORDS = {
+    "a", "an", "the", "and", "or", "of", "to", "for", "in", "on", "at", "by", "with", "from", "about", "into",
+    "is", "are", "was", "were", "be", "been", "do", "does", "did", "can", "could", "should", "would", "will",
+    "i", "me", "my", "we", "our", "you", "your", "it", "its", "this", "that", "these", "those",
+    "what", "which", "how", "why", "when", "where", "who", "whats", "hows",
+    "best", "good", "way", "ways", "tip", "tips", "advice", "please", "tell", "explain", "some", "any",
+    "need", "get", "have", "has", "better", "expect", "up", "much", "many", "now", "minimum",
+}
+# Inflections and near-exact synonyms folded onto one token so paraphrases share features.
+# Only folds that keep the meaning: loan/mortgage or property/house would serve one topic's answer for another.
+_SYNONYMS = {
+    "home": "house", "homes": "house", "houses": "house",
+    "purchase": "buy", "purchasing": "buy", "buying": "buy", "bought": "buy",
+    "saving": "save", "savings": "save", "saved": "save",
+    "investing": "invest", "investment": "invest", "investments": "invest",
+    "loans": "loan", "mortgages": "mortgage",
+    "renting": "rent",
+    "selling": "sell", "sold": "sell",
+    "cheap": "afford", "affordable": "afford", "cheapest": "afford",
+    "stocks": "stock",
+    "begin": "start", "beginning": "start", "starting": "start",
+    "raise": "improve", "boost": "improve", "increase": "improve",
+    "lower": "reduce", "lowering": "reduce", "cut": "reduce",
+    "salary": "income", "paycheck": "income", "wages": "income",
+}
+# Negated and plain questions can look alike but need different answers; they never match each other
+_NEGATIONS = {"not", "no", "never", "without", "avoid", "nor"}
+
+
+def _words(text: str) -> List[str]:
+    # "don't" / "shouldn't" -> "do not" / "should not"; "what's" -> "what"
+    text = re.sub(r"n't\b", " not", text.lower().replace("\u2019", "'"))
+    return re.findall(r"[a-z0-9]+", re.sub(r"'s\b", "", text))
+
+
+def is_negated(text: str) -> bool:
+    return any(word in _NEGATIONS for word in _words(text))
+
+
+def _tokens(text: str) -> List[str]:
+    tokens = []
+    for word in _words(text):
+        if word in _STOPWORDS or len(word) < 2:
+            continue
+        word = _SYNONYMS.get(word, word)
+        # Light stemming: "building" / "covered" / "funds" match "build" / "cover" / "fund"
+        if len(word) > 5 and word.endswith("ing"):
+            word = word[:-3]
+        elif len(word) > 5 and word.endswith("ed"):
+            word = word[:-2]
+        elif len(word) > 4 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        tokens.append(word)
+    return tokens
+
+
+def embed(text: str) -> np.ndarray:
+    """
+    Signed feature hashing of content words, their character trigrams (weight 0.3) and adjacent
+    word pairs (weight 0.3), L2-normalized so a dot product is cosine similarity. Deterministic
+    across processes (crc32). Words are hashed into two buckets so a single collision cannot make
+    unrelated words identical; word pairs tell "credit card" apart from "credit score".
+    """
+    tokens = _tokens(text)
+    features: List[Tuple[str, float]] = []
+    for token in tokens:
+        features.extend([(f"1:{token}", 0.7), (f"2:{token}", 0.7)])
+        padded = f"#{token}#"
+        features.extend((f"3:{padded[i:i + 3]}", 0.3) for i in range(len(padded) - 2))
+    features.extend((f"4:{first} {second}", 0.3) for first, second in zip(tokens, tokens[1:]))
+
+    indices: List[int] = []
+    weights: List[float] = []
+    for feature, weight in features:
+        hashed = zlib.crc32(feature.encode("utf-8"))
+        indices.append(hashed % EMBEDDING_DIM)
+        weights.append(weight if hashed & 0x80000000 else -weight)
+
+    vector = np.zeros(EMBEDDING_DIM, dtype=np.float32)
+    np.add.at(vector, indices, weights)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class SemanticCache:
+    """Fixed-capacity cache; rows of `vectors` are unit embeddings, evicted least-recently-used first"""
+
+    def __init__(self, capacity: int = SEMANTIC_CACHE_SIZE, threshold: float = SEMANTIC_CACHE_THRESHOLD,
+                 ttl_seconds: float = SEMANTIC_CACHE_TTL_SECONDS):
+        self.capacity = capacity
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.vectors = np.zeros((capacity, EMBEDDING_DIM), dtype=np.float32)
+        self.expires_at = np.zeros(capacity, dtype=np.float64)
+        self.last_used = np.zeros(capacity, dtype=np.float64)
+        self.negated = np.zeros(capacity, dtype=bool)
+        self.responses: List[Optional[str]] = [None] * capacity
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, vector: np.ndarray, negated: bool = False) -> Optional[Tuple[str, float]]:
+        if self.size == 0 or not vector.any():
+            self.misses += 1
+            return None
+
+        now = time.time()
+        scores = self.vectors[:self.size] @ vector
+        scores[self.expires_at[:self.size] <= now] = -1.0
+        scores[self.negated[:self.size] != negated] = -1.0
+        best = int(np.argmax(scores))
+        score = float(scores[best])
+        if score < self.threshold:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self.last_used[best] = now
+        return self.responses[best], score
+
+    def add(self, vector: np.ndarray, response: str, negated: bool = False):
+        if not vector.any():
+            return
+        now = time.time()
+        if self.size < self.capacity:
+            row = self.size
+            self.size += 1
+        else:
+            # Expired rows have the oldest effective use; otherwise evict the least recently used
+            usage = np.where(self.expires_at <= now, -np.inf, self.last_used)
+            row = int(np.argmin(usage))
+        self.vectors[row] = vector
+        self.responses[row] = response
+        self.negated[row] = negated
+        self.expires_at[row] = now + self.ttl_seconds
+        self.last_used[row] = now
+
+    def stats(self) -> Dict:
+        return {"entries": self.size, "capacity": self.capacity, "threshold": self.threshold,
+                "hits": self.hits, "misses": self.misses}
+
+
+# category -> cache, created on first use
+semantic_caches: Dict[str, SemanticCache] = {}
+
+
+async def get_cached_llm_response(prompt: str, category: Optional[str] = None,
+                                  question: Optional[str] = None) -> Tuple[str, Optional[float]]:
+    """
+    get_llm_response with a semantic cache in front for opted-in categories.
+    `question` is the bare user question used for matching (defaults to the prompt), so a shared
+    category template does not make every prompt look alike. Returns (response, similarity on a hit).
+    """
+    if not category or category not in SEMANTIC_CACHE_CATEGORIES:
+        return await get_llm_response(prompt), None
+
+    if category not in semantic_caches:
+        semantic_caches[category] = SemanticCache()
+    cache = semantic_caches[category]
+    text = question or prompt
+    vector = embed(text)
+    negated = is_negated(text)
+
+    with span("semantic_cache.lookup", category=category, entries=cache.size) as attributes:
+        hit = cache.lookup(vector, negated)
+        attributes["hit"] = hit is not None
+    if hit:
+        return hit
+
+    response = await get_llm_response(prompt)
+    # Never cache Groq failures
+    if not is_llm_error(response):
+        cache.add(vector, response, negated)
+    return response, None
+
+
+# Labelled (cached question, new question, same answer?) pairs; SEMANTIC_CACHE_THRESHOLD is set from these.
+# Negated/plain pairs are misses by the polarity check whatever their similarity.
+LABELLED_PAIRS = [
+    ("best way to save for a house", "how should I save to buy a home", True),
+    ("how do I save for a down payment", "what's the best way to save up for a down payment", True),
+    ("what credit score do I need for a mortgage", "minimum credit score to get a mortgage", True),
+    ("is now a good time to buy a house", "is it a good time to buy a home", True),
+    ("should I rent or buy", "is it better to rent or buy a home", True),
+    ("how much house can I afford", "how much home can I afford", True),
+    ("how do I start investing", "how should I begin investing", True),
+    ("what is a good mortgage rate", "what's a good rate for a mortgage", True),
+    ("how to build an emergency fund", "tips for building an emergency fund", True),
+    ("how much should I save for retirement", "how much do I need to save for retirement", True),
+    ("how do I improve my credit score", "ways to raise my credit score", True),
+    ("should I pay off debt or invest", "is it better to invest or pay off debt", True),
+    ("what are closing costs when buying a house", "what closing costs should I expect buying a home", True),
+    ("how do I budget my salary", "how should I budget my income", True),
+    ("how can I lower my monthly mortgage payment", "ways to reduce my monthly mortgage payment", True),
+    ("is it smart to buy a house in 2025", "should I buy a home in 2025", True),
+    ("how much should I have in my emergency fund", "how big should my emergency fund be", True),
+    ("how do I pay off credit card debt fast", "fastest way to pay off credit card debt", True),
+    ("what does a home inspection cover", "what is covered in a house inspection", True),
+    ("how do I get a car loan", "how do I get a mortgage", False),
+    ("save for a house", "save for a car", False),
+    ("sell a house", "buy a house", False),
+    ("how to buy property", "how to buy a house", False),
+    ("should I invest in bonds", "should I invest in stocks", False),
+    ("how do I save for retirement", "how do I save for college", False),
+    ("what is a good mortgage rate", "what is a good savings rate", False),
+    ("how do I improve my credit score", "how do I check my credit score", False),
+    ("how much house can I afford", "how much car can I afford", False),
+    ("how to rent an apartment", "how to buy an apartment", False),
+    ("what credit score do I need for a mortgage", "what credit score do I need for a credit card", False),
+    ("is now a good time to buy a house", "is now a good time to sell a house", False),
+    ("how do I refinance my mortgage", "how do I refinance my car loan", False),
+    ("what is a Roth IRA", "what is a traditional IRA", False),
+    ("what does a home inspection cover", "what does home insurance cover", False),
+    ("how much should I have in my emergency fund", "how much should I have in my retirement fund", False),
+    ("can I deduct mortgage interest", "can I deduct student loan interest", False),
+    ("what is a fixed rate mortgage", "what is an adjustable rate mortgage", False),
+    ("should I buy a house", "should I not buy a house", False),
+    ("should I buy a house", "shouldn't I buy a house", False),
+]
+
+
+def evaluate_pairs(threshold: float = SEMANTIC_CACHE_THRESHOLD) -> float:
+    """
+    Print each labelled pair's similarity and outcome at `threshold`, then the threshold the set
+    supports: midway between the highest-scoring non-paraphrase and the lowest-scoring paraphrase.
+    """
+    paraphrases, others = [], []
+    for cached, asked, same_answer in LABELLED_PAIRS:
+        cache = SemanticCache(capacity=1, threshold=threshold)
+        cache.add(embed(cached), cached, is_negated(cached))
+        hit = cache.lookup(embed(asked), is_negated(asked)) is not None
+        similarity = float(embed(cached) @ embed(asked))
+        if is_negated(cached) == is_negated(asked):
+            (paraphrases if same_answer else others).append(similarity)
+        ok = hit == same_answer
+        print(f"{'ok  ' if ok else 'FAIL'} {similarity:.3f} {'hit ' if hit else 'miss'}  {cached!r} vs {asked!r}")
+
+    supported = (max(others) + min(paraphrases)) / 2
+    print(f"lowest paraphrase {min(paraphrases):.3f}, highest non-paraphrase {max(others):.3f} -> threshold {supported:.2f}")
+    return supported
+
+
+def benchmark(entries: int = 100_000, queries: int = 200):
+    rng = np.random.default_rng(0)
+    words = [f"w{i}" for i in range(5000)]
+    cache = SemanticCache(capacity=entries)
+
+    def random_prompt() -> str:
+        return " ".join(rng.choice(words, size=8))
+
+    prompts = [random_prompt() for _ in range(1000)]
+    started = time.perf_counter()
+    vectors = [embed(prompt) for prompt in prompts]
+    embed_us = (time.perf_counter() - started) * 1e6 / len(prompts)
+
+    # Distinct embeddings are not needed to measure search cost; reuse them with unique responses
+    for i in range(entries):
+        cache.add(vectors[i % len(vectors)], f"response {i}")
+
+    query_vectors = [embed(random_prompt()) for _ in range(queries)]
+    started = time.perf_counter()
+    for vector in query_vectors:
+        cache.lookup(vector)
+    lookup_ms = (time.perf_counter() - started) * 1000 / queries
+
+    started = time.perf_counter()
+    for vector in query_vectors:
+        cache.add(vector, "evicting")
+    evict_ms = (time.perf_counter() - started) * 1000 / queries
+
+    print(f"entries={entries} dim={EMBEDDING_DIM} matrix={cache.vectors.nbytes / 1e6:.1f} MB")
+    print(f"embed: {embed_us:.1f} us/prompt")
+    print(f"lookup: {lookup_ms:.2f} ms/query (vectorized cosine over all entries)")
+    print(f"insert when full (LRU eviction): {evict_ms:.2f} ms")
+    print(f"labelled pairs at threshold {SEMANTIC_CACHE_THRESHOLD}:")
+    evaluate_pairs()
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,149 @@
+# Local intraday bar store (SQLite) with NumPy indicators computed from stored bars
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.dialects.sqlite import insert
+
+from backend.database import SessionLocal
+from backend.models.stock_bar import StockBar
+
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+MERGE_BATCH_SIZE = 500
+
+
+def parse_alpha_vantage_series(series: Dict[str, Dict[str, str]]) -> List[Dict]:
+    """Convert an Alpha Vantage 'Time Series (...)' mapping into bar dicts"""
+    return [
+        {
+            "timestamp": datetime.strptime(timestamp, TIMESTAMP_FORMAT),
+            "open": float(values["1. open"]),
+            "high": float(values["2. high"]),
+            "low": float(values["3. low"]),
+            "close": float(values["4. close"]),
+            "volume": int(values["5. volume"]),
+        }
+        for timestamp, values in series.items()
+    ]
+
+
+def merge_bars(symbol: str, interval: str, bars: List[Dict]) -> int:
+    """Upsert bars; overlapping timestamps are replaced with the fresher values"""
+    if not bars:
+        return 0
+
+    rows = [{"symbol": symbol, "interval": interval, **bar} for bar in bars]
+
+    db = SessionLocal()
+    try:
+        # Batched to stay under SQLite's bound-parameter limit on full-size series
+        for offset in range(0, len(rows), MERGE_BATCH_SIZE):
+            stmt = insert(StockBar).values(rows[offset:offset + MERGE_BATCH_SIZE])
+            stmt = stmt.on_conflict_do_update(
+                index_elements=["symbol", "interval", "timestamp"],
+                set_={column: stmt.excluded[column] for column in ("open", "high", "low", "close", "volume")},
+            )
+            db.execute(stmt)
+        db.commit()
+    finally:
+        db.close()
+    return len(rows)
+
+
+def load_bars(
+    symbol: str,
+    interval: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    limit: Optional[int] = None,
+) -> Dict[str, np.ndarray]:
+    """Load bars in ascending time order as column arrays (the most recent `limit` bars in range)"""
+    query = select(
+        StockBar.timestamp, StockBar.open, StockBar.high, StockBar.low, StockBar.close, StockBar.volume
+    ).where(StockBar.symbol == symbol, StockBar.interval == interval)
+    if start is not None:
+        query = query.where(StockBar.timestamp >= start)
+    if end is not None:
+        query = query.where(StockBar.timestamp <= end)
+    query = query.order_by(StockBar.timestamp.desc())
+    if limit is not None:
+        query = query.limit(limit)
+
+    db = SessionLocal()
+    try:
+        rows = db.execute(query).all()[::-1]
+    finally:
+        db.close()
+
+    return {
+        "timestamp": np.array([row[0] for row in rows], dtype="datetime64[s]"),
+        "open": np.array([row[1] for row in rows], dtype=np.float64),
+        "high": np.array([row[2] for row in rows], dtype=np.float64),
+        "low": np.array([row[3] for row in rows], dtype=np.float64),
+        "close": np.array([row[4] for row in rows], dtype=np.float64),
+        "volume": np.array([row[5] for row in rows], dtype=np.float64),
+    }
+
+
+def latest_bar(symbol: str, interval: str) -> Optional[Dict]:
+    bars = load_bars(symbol, interval, limit=1)
+    if not len(bars["timestamp"]):
+        return None
+    return {column: values[0] for column, values in bars.items()}
+
+
+def simple_moving_average(values: np.ndarray, window: int) -> np.ndarray:
+    result = np.full(len(values), np.nan)
+    if window <= 0 or len(values) < window:
+        return result
+    cumsum = np.cumsum(np.insert(values, 0, 0.0))
+    result[window - 1:] = (cumsum[window:] - cumsum[:-window]) / window
+    return result
+
+
+def simple_returns(close: np.ndarray) -> np.ndarray:
+    result = np.full(len(close), np.nan)
+    if len(close) > 1:
+        result[1:] = close[1:] / close[:-1] - 1.0
+    return result
+
+
+def session_vwap(bars: Dict[str, np.ndarray]) -> np.ndarray:
+    """VWAP on typical price, reset at the start of each trading day"""
+    count = len(bars["close"])
+    if count == 0:
+        return np.array([])
+
+    typical = (bars["high"] + bars["low"] + bars["close"]) / 3.0
+    volume = bars["volume"]
+    cum_pv = np.cumsum(typical * volume)
+    cum_v = np.cumsum(volume)
+
+    # Index of the first bar of each bar's day, so cumulative sums can be rebased per day
+    days = bars["timestamp"].astype("datetime64[D]")
+    day_start = np.ones(count, dtype=bool)
+    day_start[1:] = days[1:] != days[:-1]
+    first = np.maximum.accumulate(np.where(day_start, np.arange(count), 0))
+
+    session_pv = cum_pv - (cum_pv[first] - typical[first] * volume[first])
+    session_v = cum_v - (cum_v[first] - volume[first])
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(session_v > 0, session_pv / session_v, np.nan)
+
+
+def compute_indicators(bars: Dict[str, np.ndarray], sma_windows: List[int]) -> Dict[str, np.ndarray]:
+    indicators = {
+        "vwap": session_vwap(bars),
+        "returns": simple_returns(bars["close"]),
+    }
+    for window in sma_windows:
+        indicators[f"sma_{window}"] = simple_moving_average(bars["close"], window)
+    return indicators
+
+
+def to_json_list(values: np.ndarray) -> List:
+    """NaN is not valid JSON; emit null for indicator warm-up periods"""
+    if values.dtype.kind == "M":
+        return [str(value).replace("T", " ") for value in values]
+    return [None if np.isnan(value) else float(value) for value in values]
@@ -0,0 +1,86 @@
+# Ticker index: bundled symbols and company names/aliases in one trie
+import csv
+import os
+from typing import Dict, List, Optional, Set
+
+from backend.trie import PhraseTrie, normalize_text
+
+TICKERS_FILE = os.path.join(os.path.dirname(__file__), "data", "tickers.csv")
+
+# Symbols that are also everyday words; they only count when written in caps or as $SYMBOL.
+# Symbols of one or two letters are always treated this way.
+COMMON_WORD_SYMBOLS = {
+    "NOW", "SNOW", "COIN", "ARM", "HOOD", "LOW", "COST", "DIS", "CAT", "SNAP", "SPOT",
+    "SHOP", "WIT", "DIA", "NIO", "GLD",
+}
+# Company aliases that are also everyday words; they only count when capitalized
+COMMON_WORD_NAMES = {"meta", "chase", "target corp", "block inc", "delta airlines"}
+
+
+class TickerIndex(PhraseTrie):
+    def __init__(self):
+        super().__init__()
+        # Alias map: symbol -> ticker record
+        self.symbols: Dict[str, Dict[str, str]] = {}
+        self._name_keys: Set[str] = set()
+
+    def add_ticker(self, symbol: str, name: str, aliases: List[str]):
+        ticker = {"symbol": symbol, "name": name}
+        self.symbols[symbol] = ticker
+        for alias in [name, *aliases]:
+            self.add(alias, ticker)
+            self._name_keys.add(normalize_text(alias))
+        self.add(symbol, ticker)
+
+    def resolve(self, symbol_or_name: str) -> Optional[Dict[str, str]]:
+        return self.symbols.get(symbol_or_name.strip().lstrip("$").upper()) or self.lookup(symbol_or_name)
+
+    def find_in_text(self, text: str) -> List[Dict[str, str]]:
+        """All tickers mentioned in the text, by symbol or company name, in order and de-duplicated"""
+        words = text.split()
+        found: List[Dict[str, str]] = []
+        for matched_text, ticker in self.scan(text):
+            if matched_text in self._name_keys:
+                if matched_text in COMMON_WORD_NAMES and not _is_capitalized(words, matched_text):
+                    continue
+            elif not _symbol_written_as_ticker(words, ticker["symbol"]):
+                continue
+            if ticker not in found:
+                found.append(ticker)
+        return found
+
+
+def _is_capitalized(words: List[str], matched_text: str) -> bool:
+    first_word = matched_text.split()[0]
+    return any(normalize_text(word) == first_word and word[:1].isupper() for word in words)
+
+
+def _symbol_written_as_ticker(words: List[str], symbol: str) -> bool:
+    ambiguous = symbol in COMMON_WORD_SYMBOLS or len(symbol) <= 2
+    for word in words:
+        token = word.rstrip("?!.,;:)'\"").lstrip("(\"'")
+        if token.lstrip("$").upper() != symbol:
+            continue
+        if not ambiguous or token.startswith("$") or token.lstrip("$").isupper():
+            return True
+    return False
+
+
+def _load_ticker_index() -> TickerIndex:
+    index = TickerIndex()
+    with open(TICKERS_FILE, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            aliases = [alias for alias in (row.get("aliases") or "").split("|") if alias]
+            index.add_ticker(row["symbol"], row["name"], aliases)
+    return index
+
+
+ticker_index = _load_ticker_index()
+
+
+def resolve_ticker(symbol_or_name: str) -> Optional[Dict[str, str]]:
+    return ticker_index.resolve(symbol_or_name)
+
+
+def find_tickers(text: str) -> List[Dict[str, str]]:
+    return ticker_index.find_in_text(text)
@@ -0,0 +1,83 @@
+# Turn a traces.jsonl file into per-turn latency waterfalls
+#   python -m backend.trace_report [traces.jsonl] [--trace ID] [--last N]
+import argparse
+import json
+from collections import defaultdict
+from typing import Dict, List
+
+from backend.tracing import TRACE_FILE
+
+BAR_WIDTH = 40
+
+
+def load_traces(path: str) -> Dict[str, List[Dict]]:
+    traces: Dict[str, List[Dict]] = defaultdict(list)
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            traces[record["trace_id"]].append(record)
+    return traces
+
+
+def render_waterfall(spans: List[Dict]) -> str:
+    span_ids = {record["span_id"] for record in spans}
+    children: Dict[str, List[Dict]] = defaultdict(list)
+    roots = []
+    for record in spans:
+        if record.get("parent_id") in span_ids:
+            children[record["parent_id"]].append(record)
+        else:
+            roots.append(record)
+
+    trace_start = min(record["start"] for record in spans)
+    trace_end = max(record["start"] + record["duration_ms"] / 1000 for record in spans)
+    total_ms = max((trace_end - trace_start) * 1000, 0.001)
+
+    lines = [f"trace {spans[0]['trace_id']}  {total_ms:.1f} ms  {len(spans)} spans"]
+
+    def walk(record: Dict, depth: int):
+        offset_ms = (record["start"] - trace_start) * 1000
+        begin = int(offset_ms / total_ms * BAR_WIDTH)
+        width = max(1, int(record["duration_ms"] / total_ms * BAR_WIDTH))
+        bar = (" " * begin + "#" * width).ljust(BAR_WIDTH)[:BAR_WIDTH]
+        flag = " !" if record.get("status") == "error" else ""
+        lines.append(
+            f"{offset_ms:9.1f} |{bar}| {record['duration_ms']:9.1f} ms  "
+            f"{'  ' * depth}{record.get('service', '?')}:{record['name']}{flag}"
+        )
+        for child in sorted(children[record["span_id"]], key=lambda item: item["start"]):
+            walk(child, depth + 1)
+
+    for root in sorted(roots, key=lambda item: item["start"]):
+        walk(root, 0)
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render per-turn waterfalls from a trace JSONL file")
+    parser.add_argument("path", nargs="?", default=TRACE_FILE or "traces.jsonl")
+    parser.add_argument("--trace", help="Only this correlation ID")
+    parser.add_argument("--last", type=int, default=5, help="Show the N most recent traces")
+    args = parser.parse_args()
+
+    traces = load_traces(args.path)
+    if args.trace:
+        selected = [traces[args.trace]] if args.trace in traces else []
+    else:
+        ordered = sorted(traces.values(), key=lambda spans: min(record["start"] for record in spans))
+        selected = ordered[-args.last:]
+
+    if not selected:
+        print("No matching traces")
+        return
+    print("\n\n".join(render_waterfall(spans) for spans in selected))
+
+
+if __name__ == "__main__":
+    main()
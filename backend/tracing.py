@@ -0,0 +1,214 @@
+# Lightweight span tracing for latency analysis; spans are appended to a local JSONL file.
+# Opt-in: nothing is recorded unless TRACE_FILE is set. Spans are written by a background thread,
+# so request paths never block on file I/O.
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional, TextIO, Tuple
+
+logger = logging.getLogger(__name__)
+
+TRACE_FILE = os.getenv("TRACE_FILE", "")
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "1.0"))
+# The file is rotated to TRACE_FILE.1 (one backup) once it reaches this size
+TRACE_MAX_BYTES = int(os.getenv("TRACE_MAX_BYTES", str(50 * 1024 * 1024)))
+# Spans waiting for the writer; beyond this they are dropped rather than slowing requests
+TRACE_QUEUE_SIZE = int(os.getenv("TRACE_QUEUE_SIZE", "10000"))
+
+CORRELATION_HEADER = "X-Correlation-ID"
+PARENT_SPAN_HEADER = "X-Parent-Span-ID"
+SAMPLED_HEADER = "X-Trace-Sampled"
+
+# (trace_id, current span id, sampled); sampled is None when no service has made the decision yet
+_context: ContextVar[Optional[Tuple[str, Optional[str], Optional[bool]]]] = ContextVar("trace_context", default=None)
+_service_name = os.getenv("TRACE_SERVICE_NAME", "backend")
+
+_records: "queue.Queue[Optional[Dict]]" = queue.Queue(maxsize=TRACE_QUEUE_SIZE)
+_writer: Optional[threading.Thread] = None
+_writer_lock = threading.Lock()
+_dropped = 0
+
+
+def configure(service: str):
+    global _service_name
+    _service_name = service
+
+
+def _new_id() -> str:
+    return uuid.uuid4().hex[:16]
+
+
+def current_context() -> Optional[Tuple[str, Optional[str], Optional[bool]]]:
+    return _context.get()
+
+
+def current_trace_id() -> Optional[str]:
+    context = _context.get()
+    return context[0] if context else None
+
+
+@contextmanager
+def use_context(context: Optional[Tuple[str, Optional[str], Optional[bool]]]):
+    """Re-enter a captured context, e.g. in a background worker picking up a queued job"""
+    token = _context.set(context)
+    try:
+        yield
+    finally:
+        _context.reset(token)
+
+
+@contextmanager
+def start_trace(
+    trace_id: Optional[str] = None,
+    parent_span_id: Optional[str] = None,
+    sampled: Optional[bool] = None,
+):
+    """
+    Begin (or continue, when ids come from headers) a trace. Sampling is decided once, by the first
+    service that records spans; a service without TRACE_FILE leaves it undecided for the next hop.
+    """
+    if sampled is None and TRACE_FILE:
+        sampled = random.random() < TRACE_SAMPLE_RATE
+    with use_context((trace_id or uuid.uuid4().hex, parent_span_id, sampled)):
+        yield
+
+
+def trace_context_from_headers(headers) -> Dict:
+    sampled_header = headers.get(SAMPLED_HEADER)
+    return {
+        "trace_id": headers.get(CORRELATION_HEADER),
+        "parent_span_id": headers.get(PARENT_SPAN_HEADER),
+        "sampled": None if sampled_header is None else sampled_header == "1",
+    }
+
+
+def trace_headers() -> Dict[str, str]:
+    """Headers that continue the current trace in another service"""
+    context = _context.get()
+    if context is None:
+        return {}
+    trace_id, span_id, sampled = context
+    headers = {CORRELATION_HEADER: trace_id}
+    if sampled is not None:
+        headers[SAMPLED_HEADER] = "1" if sampled else "0"
+    if span_id:
+        headers[PARENT_SPAN_HEADER] = span_id
+    return headers
+
+
+def _write_batch(f: Optional[TextIO], batch) -> Optional[TextIO]:
+    """Append records, rotating when the file is full. Returns the open file (None after rotation or errors)"""
+    try:
+        if f is None:
+            f = open(TRACE_FILE, "a", encoding="utf-8")
+        f.write("".join(json.dumps(record, default=str) + "\n" for record in batch))
+        f.flush()
+        if f.tell() >= TRACE_MAX_BYTES:
+            f.close()
+            os.replace(TRACE_FILE, f"{TRACE_FILE}.1")
+            f = None
+    except OSError as e:
+        logger.warning(f"Could not write trace spans: {str(e)}")
+        if f is not None:
+            f.close()
+        f = None
+    return f
+
+
+def _writer_loop():
+    f = None
+    while True:
+        # Block for one record, then drain whatever else is queued into the same write
+        batch = [_records.get()]
+        while len(batch) < 1000:
+            try:
+                batch.append(_records.get_nowait())
+            except queue.Empty:
+                break
+
+        stop = None in batch
+        records = [record for record in batch if record is not None]
+        if records:
+            f = _write_batch(f, records)
+        if stop:
+            if f is not None:
+                f.close()
+            return
+
+
+def _ensure_writer():
+    global _writer
+    if _writer is not None and _writer.is_alive():
+        return
+    with _writer_lock:
+        if _writer is None or not _writer.is_alive():
+            _writer = threading.Thread(target=_writer_loop, name="trace-writer", daemon=True)
+            _writer.start()
+
+
+@atexit.register
+def _flush_on_exit():
+    if _writer is not None and _writer.is_alive():
+        try:
+            _records.put(None, timeout=1.0)
+        except queue.Full:
+            return
+        _writer.join(timeout=2.0)
+
+
+def _export(record: Dict):
+    global _dropped
+    _ensure_writer()
+    try:
+        _records.put_nowait(record)
+    except queue.Full:
+        _dropped += 1
+        if _dropped % 1000 == 1:
+            logger.warning(f"Trace writer is behind; dropped {_dropped} spans so far")
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """
+    Time a block as a child of the current span. Safe in sync and async code;
+    asyncio.to_thread copies the context, so spans inside worker threads nest correctly.
+    """
+    context = _context.get()
+    if context is None or not context[2] or not TRACE_FILE:
+        yield attributes
+        return
+
+    trace_id, parent_id, sampled = context
+    span_id = _new_id()
+    token = _context.set((trace_id, span_id, sampled))
+    start = time.time()
+    started = time.perf_counter()
+    status, error = "ok", None
+    try:
+        # Callers may add attributes discovered inside the block
+        yield attributes
+    except BaseException as e:
+        status, error = "error", f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _context.reset(token)
+        _export({
+            "trace_id": trace_id,
+            "span_id": span_id,
+            "parent_id": parent_id,
+            "service": _service_name,
+            "name": name,
+            "start": start,
+            "duration_ms": round((time.perf_counter() - started) * 1000, 3),
+            "status": status,
+            "error": error,
+            "attributes": attributes,
+        })
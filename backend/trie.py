@@ -0,0 +1,61 @@
+# Character trie over normalized phrases, shared by the city gazetteer and ticker index
+import re
+import unicodedata
+from typing import Any, Dict, List, Optional, Tuple
+
+_TERMINAL = "$"
+
+
+def normalize_text(text: str) -> str:
+    """Lowercase, strip accents and punctuation, collapse whitespace"""
+    decomposed = unicodedata.normalize("NFKD", text)
+    ascii_only = "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return re.sub(r"[^a-z0-9]+", " ", ascii_only.lower()).strip()
+
+
+class PhraseTrie:
+    def __init__(self):
+        self.root: Dict = {}
+
+    def add(self, phrase: str, value: Any):
+        key = normalize_text(phrase)
+        if not key:
+            return
+        node = self.root
+        for ch in key:
+            node = node.setdefault(ch, {})
+        # First value wins for a shared phrase
+        node.setdefault(_TERMINAL, value)
+
+    def lookup(self, phrase: str) -> Optional[Any]:
+        """Exact match on a normalized phrase"""
+        node = self.root
+        for ch in normalize_text(phrase):
+            node = node.get(ch)
+            if node is None:
+                return None
+        return node.get(_TERMINAL)
+
+    def scan(self, text: str) -> List[Tuple[str, Any]]:
+        """
+        Longest phrase starting at each word of the text, matched on word boundaries.
+        Returns (matched_phrase, value) pairs in text order; one pass over the text per word start.
+        """
+        normalized = normalize_text(text)
+        matches = []
+
+        starts = [0] + [i + 1 for i, ch in enumerate(normalized) if ch == " "]
+        for start in starts:
+            node = self.root
+            match = None
+            for i in range(start, len(normalized) + 1):
+                if (i == len(normalized) or normalized[i] == " ") and _TERMINAL in node:
+                    match = (normalized[start:i], node[_TERMINAL])
+                if i == len(normalized):
+                    break
+                node = node.get(normalized[i])
+                if node is None:
+                    break
+            if match is not None:
+                matches.append(match)
+        return matches
@@ -1,6 +1,8 @@
 import os
 import sys
+import json
 import uuid
+import asyncio
 import httpx
 import mimetypes
 from datetime import datetime
@@ -10,7 +12,11 @@ from dotenv import load_dotenv
 # Add backend path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 from backend.memory import store_message
+from backend.gazetteer import find_city, extract_location_phrase
+from backend.ticker_index import find_tickers
+from backend import tracing
 load_dotenv()
+tracing.configure(service="chainlit")
 
 # Backend URL from environment
 BACKEND_URL = os.getenv("BACKEND_URL", "http://localhost:8000")
@@ -33,6 +39,8 @@ def detect_intent(message: str, category: str):
     if category == "general":
         if "weather" in msg or "temperature" in msg or "forecast" in msg:
             return "weather"
+        elif any(word in msg for word in ["rain", "sunny", "humid", "snow", "storm"]) and find_city(message):
+            return "weather"
         elif "stock" in msg or "share" in msg or "ticker" in msg:
             return "stock"
         elif "calendar" in msg or "schedule" in msg or "appointment" in msg:
@@ -88,7 +96,7 @@ def is_relevant_to_category(message: str, category: str):
 # Feature toggles from backend
 async def get_feature_toggles():
     try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
+        async with httpx.AsyncClient(timeout=10.0, headers=tracing.trace_headers()) as client:
             res = await client.get(f"{API_BASE}/admin/feature-toggles")
             if res.status_code == 200:
                 return res.json()
@@ -97,6 +105,156 @@ async def get_feature_toggles():
     except Exception:
         return {"chat": True, "weather": True, "stock": True, "calendar": True, "upload": True}
 
+# Upload job progress
+def format_job_progress(event: dict) -> str:
+    stage = event.get("stage")
+    if stage == "received":
+        return "📥 File received, waiting for a worker..."
+    if stage == "extracting":
+        return f"🔍 Extracting page {event.get('page')}/{event.get('total_pages')}..."
+    if stage == "summarizing":
+        if event.get("total_chunks", 1) > 1:
+            return f"🧠 Summarizing section {event.get('chunk')}/{event.get('total_chunks')}..."
+        return "🧠 Summarizing..."
+    if stage == "reducing":
+        return f"🧩 Combining {event.get('total_chunks')} section summaries..."
+    if stage == "done":
+        return "✅ Done, fetching results..."
+    if stage == "failed":
+        return f"❌ Processing failed: {event.get('error')}"
+    return "⏳ Processing your file..."
+
+async def follow_job_progress(client: httpx.AsyncClient, job_id: str, processing_msg: cl.Message):
+    """Render job stage progress from the SSE stream, falling back to polling"""
+    async def show(event: dict):
+        processing_msg.content = format_job_progress(event)
+        await processing_msg.update()
+
+    try:
+        async with client.stream("GET", f"{API_BASE}/jobs/{job_id}/events", timeout=httpx.Timeout(30.0, read=None)) as res:
+            async for line in res.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                event = json.loads(line[len("data:"):])
+                await show(event)
+                if event.get("stage") in ("done", "failed"):
+                    return
+    except (httpx.HTTPError, ValueError):
+        pass
+
+    while True:
+        res = await client.get(f"{API_BASE}/jobs/{job_id}")
+        if res.status_code != 200:
+            return
+        job = res.json()
+        await show({"stage": job["stage"], **job.get("progress", {})})
+        if job["status"] in ("done", "failed"):
+            return
+        await asyncio.sleep(1.0)
+
+# Stocks
+def format_stock_quotes(data: dict) -> str:
+    """Render a /stock quote or a /stock/batch {"results": [...]} reply"""
+    lines = []
+    for quote in data.get("results", [data]):
+        if "close" not in quote:
+            lines.append(f"❌ **{quote.get('symbol', '?')}**: {quote.get('response', 'No data')}")
+            continue
+        line = (
+            f"📈 **{quote['symbol']}** {quote['close']} "
+            f"(open {quote['open']}, high {quote['high']}, low {quote['low']}, volume {quote['volume']}) "
+            f"as of {quote['timestamp']}"
+        )
+        if quote.get("stale"):
+            line += " ⚠️ cached, live data unavailable"
+        lines.append(line)
+    return "\n".join(lines)
+
+# Calendar
+def format_calendar_events(data: dict) -> str:
+    events = data.get("events", [])
+    if not events:
+        return "📅 No events in this period. Attach an .ics file to import your calendar."
+    lines = [f"📅 **{len(events)} upcoming event(s)** (UTC):"]
+    for event in events:
+        start = datetime.fromisoformat(event["start"])
+        end = datetime.fromisoformat(event["end"])
+        lines.append(f"- {start:%a %b %d %H:%M}–{end:%H:%M} **{event.get('summary') or 'Untitled'}**")
+    if data.get("truncated"):
+        lines.append("…and more")
+    return "\n".join(lines)
+
+async def import_calendar_file(element, session_id: str) -> str:
+    """Import an .ics attachment into this chat session's calendar"""
+    async with httpx.AsyncClient(timeout=30.0, headers=tracing.trace_headers()) as client:
+        with open(element.path, "rb") as f:
+            res = await client.post(
+                f"{API_BASE}/calendar-events/import",
+                files={"file": (element.name, f, "text/calendar")},
+                params={"session_id": session_id},
+            )
+    if res.status_code != 200:
+        return f"❌ Calendar import failed with status {res.status_code}: {res.text}"
+
+    data = res.json()
+    reply = f"📅 Imported {data['imported']} event(s) from **{element.name}**."
+    if data.get("recurring_not_expanded"):
+        reply += f"\n{data['recurring_not_expanded']} recurring event(s) were imported as their first occurrence only."
+    if data.get("skipped"):
+        reply += f"\n{data['skipped']} cancelled or invalid event(s) were skipped."
+    return reply
+
+async def upload_files_batch(elements) -> str:
+    """Send all attachments in one request and render per-file results as they stream back"""
+    processing_msg = await cl.Message(content=f"⏳ Processing {len(elements)} files...").send()
+    sections = {}
+    succeeded = 0
+    combined = None
+    handles = []
+    try:
+        files = []
+        for element in elements:
+            file_type, _ = mimetypes.guess_type(element.path)
+            handle = open(element.path, "rb")
+            handles.append(handle)
+            files.append(("files", (element.name, handle, file_type or "application/octet-stream")))
+
+        async with httpx.AsyncClient(timeout=httpx.Timeout(30.0, read=None), headers=tracing.trace_headers()) as client:
+            async with client.stream(
+                "POST", f"{API_BASE}/upload-files", files=files, params={"combined_summary": "true"}
+            ) as res:
+                if res.status_code != 200:
+                    await res.aread()
+                    return f"❌ Upload failed with status {res.status_code}: {res.text}"
+
+                async for line in res.aiter_lines():
+                    if not line.strip():
+                        continue
+                    item = json.loads(line)
+                    if item["event"] == "file":
+                        if item["status"] == "success":
+                            sections[item["index"]] = f"📄 **{item['filename']}** ({item.get('type', 'unknown').upper()})\n{item['content']}"
+                        else:
+                            sections[item["index"]] = f"❌ **{item['filename']}**: {item['error']}"
+                        processing_msg.content = f"⏳ Processed {len(sections)}/{len(elements)} files..."
+                        if item["status"] == "success":
+                            succeeded += 1
+                        # The backend combines once every file is in, if at least two succeeded
+                        if len(sections) == len(elements) and succeeded > 1:
+                            processing_msg.content = "🧩 Combining summaries..."
+                        await processing_msg.update()
+                    elif item["event"] == "combined":
+                        combined = item["content"]
+    finally:
+        for handle in handles:
+            handle.close()
+        await processing_msg.remove()
+
+    reply = "\n\n".join(sections[index] for index in sorted(sections))
+    if combined:
+        reply = f"🗂 **Combined summary:**\n{combined}\n\n---\n\n{reply}"
+    return reply
+
 @cl.on_chat_start
 async def start_chat():
     session_id = str(uuid.uuid4())
@@ -115,7 +273,7 @@ async def start_chat():
     ).send()
 
     await cl.Message(
-        content="👋 Welcome! Please choose a domain from the **settings panel** (gear icon in the top right).\n\nYou can also upload PDF or image files for analysis!"
+        content="👋 Welcome! Please choose a domain from the **settings panel** (gear icon in the top right).\n\nYou can also upload PDF or image files for analysis, or an .ics file to import your calendar!"
     ).send()
 
 @cl.on_settings_update
@@ -133,6 +291,12 @@ async def settings_update(settings):
 
 @cl.on_message
 async def handle_user_message(msg: cl.Message):
+    # One correlation ID per turn, propagated to every backend call via headers
+    with tracing.start_trace():
+        with tracing.span("chainlit.turn", session_id=cl.user_session.get("session_id"), has_files=bool(msg.elements)):
+            await process_user_message(msg)
+
+async def process_user_message(msg: cl.Message):
     session_id = cl.user_session.get("session_id")
     category = cl.user_session.get("category", "general")
     prompt = msg.content
@@ -152,36 +316,50 @@ async def handle_user_message(msg: cl.Message):
         file_type, _ = mimetypes.guess_type(file_path)
 
         try:
-            async with httpx.AsyncClient(timeout=120.0) as client:  # Increased timeout for file processing
-                with open(file_path, "rb") as f:
-                    files = {"file": (uploaded_file.name, f, file_type or "application/octet-stream")}
+            if len(msg.elements) == 1 and uploaded_file.name.lower().endswith(".ics"):
+                if not toggles.get("calendar", True):
+                    await cl.Message("🚫 Calendar feature is disabled by admin.").send()
+                    return
+                reply = await import_calendar_file(uploaded_file, session_id)
+            elif len(msg.elements) > 1:
+                # Several attachments go to the backend in one batch call
+                reply = await upload_files_batch(msg.elements)
+            else:
+                async with httpx.AsyncClient(timeout=30.0, headers=tracing.trace_headers()) as client:
+                    with open(file_path, "rb") as f:
+                        files = {"file": (uploaded_file.name, f, file_type or "application/octet-stream")}
                     
-                    # Show processing message
-                    processing_msg = await cl.Message(content="⏳ Processing your file...").send()
+                        # Show processing message
+                        processing_msg = await cl.Message(content="⏳ Uploading your file...").send()
                     
-                    res = await client.post(f"{API_BASE}/upload-file", files=files)
+                        res = await client.post(f"{API_BASE}/upload-jobs", files=files)
 
-                # Remove processing message
-                await processing_msg.remove()
+                    if res.status_code == 202:
+                        job_id = res.json()["job_id"]
+                        await follow_job_progress(client, job_id, processing_msg)
+                        res = await client.get(f"{API_BASE}/jobs/{job_id}/result")
 
-                if res.status_code == 200:
-                    data = res.json()
+                    # Remove processing message
+                    await processing_msg.remove()
+
+                    if res.status_code == 200:
+                        data = res.json()
                     
-                    if "error" in data:
-                        reply = f"❌ {data['error']}"
-                    else:
-                        file_type_display = data.get("type", "unknown").upper()
-                        content = data.get("content", "No content extracted")
-                        extracted_text = data.get("extracted_text", "")
+                        if "error" in data:
+                            reply = f"❌ {data['error']}"
+                        else:
+                            file_type_display = data.get("type", "unknown").upper()
+                            content = data.get("content", "No content extracted")
+                            extracted_text = data.get("extracted_text", "")
                         
-                        reply = f"📄 **File:** {uploaded_file.name}\n**Type:** {file_type_display}\n\n**Summary:**\n{content}"
+                            reply = f"📄 **File:** {uploaded_file.name}\n**Type:** {file_type_display}\n\n**Summary:**\n{content}"
                         
-                        # If there's extracted text and it's different from summary, show a preview
-                        if extracted_text and extracted_text != content:
-                            preview = extracted_text[:500] + "..." if len(extracted_text) > 500 else extracted_text
-                            reply += f"\n\n**Extracted Text Preview:**\n```\n{preview}\n```"
-                else:
-                    reply = f"❌ Upload failed with status {res.status_code}: {res.text}"
+                            # If there's extracted text and it's different from summary, show a preview
+                            if extracted_text and extracted_text != content:
+                                preview = extracted_text[:500] + "..." if len(extracted_text) > 500 else extracted_text
+                                reply += f"\n\n**Extracted Text Preview:**\n```\n{preview}\n```"
+                    else:
+                        reply = f"❌ Upload failed with status {res.status_code}: {res.text}"
 
         except httpx.TimeoutException:
             reply = "⏰ File processing timed out. Please try with a smaller file."
@@ -192,7 +370,7 @@ async def handle_user_message(msg: cl.Message):
 
         # Store the interaction
         try:
-            store_message(session_id, "user", f"[FILE UPLOAD] {uploaded_file.name}")
+            store_message(session_id, "user", f"[FILE UPLOAD] {', '.join(element.name for element in msg.elements)}")
             store_message(session_id, "assistant", reply)
         except Exception:
             pass
@@ -221,7 +399,7 @@ async def handle_user_message(msg: cl.Message):
 
     # Handle different intents
     try:
-        async with httpx.AsyncClient(timeout=30.0) as client:
+        async with httpx.AsyncClient(timeout=30.0, headers=tracing.trace_headers()) as client:
             # Get category-specific prompt template
             final_prompt = prompt
             if category != "general":
@@ -242,54 +420,63 @@ async def handle_user_message(msg: cl.Message):
                     await cl.Message("🚫 Weather feature is disabled by admin.").send()
                     return
                     
-                # Extract city from prompt
-                city = "london"  # default
-                if "in" in prompt:
-                    city = prompt.split("in")[-1].strip().replace("?", "").replace(".", "")
-                elif "for" in prompt:
-                    city = prompt.split("for")[-1].strip().replace("?", "").replace(".", "")
+                # Known cities resolve through the local gazetteer; anything else is sent as typed
+                # ("weather in Springfield") and /weather's negative cache absorbs upstream misses
+                city = find_city(prompt)
+                location = city["query"] if city else extract_location_phrase(prompt)
+                if not location:
+                    await cl.Message("🌍 Which city? Try something like \"weather in Paris\".").send()
+                    return
                 
-                res = await client.get(f"{API_BASE}/weather", params={"city": city})
+                res = await client.get(f"{API_BASE}/weather", params={"city": location})
 
             elif intent == "stock":
                 if not toggles.get("stock", True):
                     await cl.Message("🚫 Stock feature is disabled by admin.").send()
                     return
                     
-                # Extract stock symbol from prompt
-                words = prompt.upper().split()
-                symbol = "AAPL"  # default
-                for word in reversed(words):
-                    if word.replace("?", "").replace(".", "").isalpha() and len(word) <= 5:
-                        symbol = word.replace("?", "").replace(".", "")
-                        break
+                # Extract every known ticker (by symbol or company name) from the prompt
+                symbols = [ticker["symbol"] for ticker in find_tickers(prompt)]
+                if not symbols:
+                    await cl.Message("📈 Which stock? Mention a ticker like AAPL or a company like Microsoft.").send()
+                    return
                 
-                res = await client.get(f"{API_BASE}/stock", params={"symbol": symbol})
+                if len(symbols) == 1:
+                    res = await client.get(f"{API_BASE}/stock", params={"symbol": symbols[0]})
+                else:
+                    res = await client.get(f"{API_BASE}/stock/batch", params={"symbols": ",".join(symbols)})
 
             elif intent == "calendar":
                 if not toggles.get("calendar", True):
                     await cl.Message("🚫 Calendar feature is disabled by admin.").send()
                     return
                     
-                res = await client.get(f"{API_BASE}/calendar-events")
+                res = await client.get(f"{API_BASE}/calendar-events", params={"session_id": session_id})
 
             else:  # Default to chat
                 if not toggles.get("chat", True):
                     await cl.Message("🚫 Chat feature is disabled by admin.").send()
                     return
                     
-                res = await client.get(f"{API_BASE}/chat", params={"prompt": final_prompt})
+                res = await client.get(
+                    f"{API_BASE}/chat",
+                    params={"prompt": final_prompt, "category": category, "question": prompt},
+                )
 
             # Parse response
             if res.status_code == 200:
                 try:
                     data = res.json()
-                    reply = data.get("response") or data.get("result") or str(data)
+                    if intent == "calendar":
+                        reply = format_calendar_events(data)
+                    elif intent == "stock":
+                        reply = format_stock_quotes(data)
+                    else:
+                        reply = data.get("response") or data.get("result") or str(data)
                     
                     # Clean up common API response artifacts
                     if reply.startswith('{"') and reply.endswith('"}'):
                         try:
-                            import json
                             parsed = json.loads(reply)
                             reply = parsed.get("response", reply)
                         except:
@@ -313,7 +500,7 @@ async def handle_user_message(msg: cl.Message):
         store_message(session_id, "assistant", reply)
         
         # Store in backend chat history
-        async with httpx.AsyncClient(timeout=10.0) as client:
+        async with httpx.AsyncClient(timeout=10.0, headers=tracing.trace_headers()) as client:
             await client.post(f"{API_BASE}/chat-history", json={
                 "session_id": session_id,
                 "prompt": prompt,